@@ -0,0 +1,190 @@
+"""
+Batch position analysis.
+
+    python analyze.py positions.txt --workers 8 --nodes 50000 > results.jsonl
+
+Reads one position a line and writes one json line of results for each, as
+they come in. A position is either
+    a move sequence                 4453  (columns from 0, from the empty board)
+    Game.getStateTuple() columns    ('', '', '1', '01', '0', '1', '')
+                                    or ,,1,01,0,1,  (the same position as 33245)
+Blank lines and lines starting with # are skipped. Each result has the line
+number and input, then the best move, its score, the depth reached, the
+nodes searched and the time taken, or an error for a line that isn't a
+position that can still be played.
+
+The positions are spread over a process pool; every worker keeps one engine
+(and so its transposition table, or the AI's Q values and cache) for all the
+positions it gets, and nothing is held on to once its result is written.
+"""
+
+import argparse
+import ast
+import json
+import multiprocessing
+import sys
+import time
+
+import cli
+from bitboard import HEIGHT, WIDTH, Position
+from book import default_book
+from qtable import QTableFile
+from search import Searcher, TranspositionTable
+from tablebase import default_tablebase
+
+
+def parse(text):
+    """the Position described by one line of input, ValueError if it isn't one"""
+    text = text.strip()
+    if text.startswith("("):
+        try:
+            columns = ast.literal_eval(text)
+        except (SyntaxError, RecursionError, MemoryError):
+            raise ValueError("expected a tuple of column strings") from None
+    elif "," in text:
+        columns = text.split(",")
+    else:
+        if not text.isdigit():
+            raise ValueError("expected a move sequence or column strings")
+        pos = Position()
+        for digit in text:
+            col = int(digit)
+            if col >= WIDTH or not pos.can_play(col) or pos.has_won():
+                raise ValueError(f"illegal move {col} after {pos.moves} moves")
+            pos.play(col)
+        return pos
+    if not isinstance(columns, (tuple, list)) or not all(isinstance(col, str) for col in columns):
+        raise ValueError("expected a tuple of column strings")
+    columns = [col.strip() for col in columns]
+    if len(columns) != WIDTH or any(len(col) > HEIGHT or set(col) - {"0", "1"} for col in columns):
+        raise ValueError(f"expected {WIDTH} columns of 0s and 1s, at most {HEIGHT} long")
+    pos = Position.from_columns(columns)
+    mover = sum(col.count("0") for col in columns)
+    if pos.moves - 2 * mover not in (0, 1):
+        raise ValueError("the stone counts don't fit a game with 0 to move")
+    return pos
+
+
+class MinimaxAnalyser:
+    """search.Searcher, with the opening book and tablebase, keeping its transposition table"""
+    def __init__(self, nodes=50000, time_limit=None):
+        self.searcher = Searcher(max_nodes=nodes, time_limit=time_limit,
+                                 tt=TranspositionTable(), tablebase=default_tablebase())
+
+    def analyse(self, pos):
+        hit = default_book().probe(pos)
+        if hit is not None:
+            return hit[0], hit[1], 0, 0
+        res = self.searcher.search(pos)
+        return res.move, res.score, res.depth, res.nodes
+
+
+class QAnalyser:
+    """cli.AI looking `depth` moves ahead, keeping its Q values and cache"""
+    def __init__(self, depth=4, path=None):
+        self.depth = depth
+        self.model = cli.AI(table=QTableFile(path) if path else None)
+
+    def analyse(self, pos):
+        player = pos.moves % 2
+        game = cli.Game(state=pos.columns(), player=player, targets="10" if player else "01")
+        before = self.model.nodes
+        move, score = self.model.best_action(game, self.depth)
+        return move, score, self.depth, self.model.nodes - before
+
+
+def make_analyser(engine="minimax", nodes=50000, time_limit=None, depth=4, qtable=None):
+    if engine == "minimax":
+        return MinimaxAnalyser(nodes, time_limit)
+    if engine == "ai":
+        return QAnalyser(depth, qtable)
+    raise ValueError(f"unknown engine {engine!r}")
+
+
+def analyse_line(analyser, number, text):
+    """the result for one line of input"""
+    result = {"line": number, "input": text}
+    try:
+        pos = parse(text)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+    if pos.has_won() or pos.full():
+        result["error"] = "the game is over"
+        return result
+    start = time.perf_counter()
+    move, score, depth, nodes = analyser.analyse(pos)
+    result.update(move=move, score=score, depth=depth, nodes=nodes,
+                  ms=round(1000 * (time.perf_counter() - start), 3))
+    return result
+
+
+# the worker's analyser, made once by _init_worker
+_analyser = None
+
+
+def _init_worker(options):
+    global _analyser
+    _analyser = make_analyser(**options)
+
+
+def _analyse(item):
+    return analyse_line(_analyser, *item)
+
+
+def numbered(lines):
+    """(line number, text) for the lines that hold a position"""
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if text and not text.startswith("#"):
+            yield number, text
+
+
+def analyse(lines, workers=None, ordered=True, chunksize=16, **options):
+    """
+    yields a result dict for every position in `lines` (any iterable of
+    strings, e.g. an open file), in input order or, with ordered=False, as
+    they finish. `options` pick the engine, see make_analyser.
+    workers=0 analyses in this process
+    """
+    items = numbered(lines)
+    if workers == 0:
+        analyser = make_analyser(**options)
+        for item in items:
+            yield analyse_line(analyser, *item)
+        return
+    with multiprocessing.Pool(workers, _init_worker, (options,)) as pool:
+        run = pool.imap if ordered else pool.imap_unordered
+        yield from run(_analyse, items, chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyses a file of Connect4 positions")
+    parser.add_argument("input", nargs="?", default="-", help="file of positions, - for stdin")
+    parser.add_argument("--out", default="-", help="json lines file, - for stdout")
+    parser.add_argument("--engine", choices=["minimax", "ai"], default="minimax")
+    parser.add_argument("--nodes", type=int, default=50000, help="minimax budget per position")
+    parser.add_argument("--time", type=float, default=None, help="minimax seconds per position")
+    parser.add_argument("--depth", type=int, default=4, help="ai lookahead")
+    parser.add_argument("--qtable", default=None, help="Q-table file for the ai")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--unordered", action="store_true", help="write results as they finish")
+    args = parser.parse_args(argv)
+
+    options = dict(engine=args.engine, nodes=args.nodes, time_limit=args.time,
+                   depth=args.depth, qtable=args.qtable)
+    src = sys.stdin if args.input == "-" else open(args.input)
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    try:
+        for result in analyse(src, args.workers, not args.unordered, **options):
+            out.write(json.dumps(result) + "\n")
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Batched self-play with NumPy.
+
+Plays thousands of games side by side. Every game is a pair of uint64
+bitboards laid out like bitboard.py, so legal moves, playing a move and the
+four-in-a-row test (all 69 lines at once, via the same shift-and-mask trick)
+are a handful of array operations for the whole batch.
+Moves are random, or epsilon-greedy over a snapshot of an AI's Q-table, and
+every ply is returned as a bulk Transitions record keyed like cli.AI.key.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from bitboard import WIDTH, HEIGHT, H1, SIZE, BOARD, COLUMNS, bottom_mask, top_mask
+
+U64 = np.uint64
+BOARD_MASK = U64(BOARD)
+COLUMN_MASKS = np.array(COLUMNS, dtype=U64)
+BOTTOMS = np.array([bottom_mask(c) for c in range(WIDTH)], dtype=U64)
+TOPS = np.array([top_mask(c) for c in range(WIDTH)], dtype=U64)
+ACTIONS = np.arange(WIDTH, dtype=U64)
+
+# game, ply: where the row came from
+# key:       the Q key of the move (cli.AI.key)
+# after:     canonical key of the position after the move, seen as cli.AI.key << 3
+# reward:    1 for a winning move, -1 for the loser's last move, 0 otherwise
+# done:      the move ended the game
+Transitions = namedtuple("Transitions", "game ply key after reward done")
+
+
+def alignment(stones):
+    """vectorized bitboard.alignment: True where `stones` has four in a row"""
+    out = np.zeros(stones.shape, dtype=bool)
+    for shift in (H1, H1 + 1, HEIGHT, 1):
+        m = stones & (stones >> U64(shift))
+        out |= (m & (m >> U64(2 * shift))) != 0
+    return out
+
+
+def mirror(bits):
+    """vectorized bitboard.mirror"""
+    out = np.zeros(bits.shape, dtype=U64)
+    col = U64((1 << H1) - 1)
+    for c in range(WIDTH):
+        out |= ((bits >> U64(c * H1)) & col) << U64((WIDTH - 1 - c) * H1)
+    return out
+
+
+def q_keys(board_key, mirror_key):
+    """
+    the cli.AI.key of every action in every position, shape (games, WIDTH),
+    plus the canonical position keys
+    """
+    mirrored = mirror_key < board_key
+    symmetric = mirror_key == board_key
+    canon = np.where(mirrored, mirror_key, board_key)
+    flipped = U64(WIDTH - 1) - ACTIONS
+    actions = np.where(mirrored[:, None], flipped[None, :],
+                       np.where(symmetric[:, None], np.minimum(ACTIONS, flipped)[None, :], ACTIONS[None, :]))
+    return (canon[:, None] << U64(3)) | actions, canon
+
+
+def snapshot(model):
+    """sorted (keys, values) arrays of everything `model` (a cli.AI) knows"""
+    q = model.q
+    if model.table is not None:
+        if not q:
+            return np.asarray(model.table.keys), np.asarray(model.table.values)
+        q = dict(model.table.items())
+        q.update(model.q)
+    keys = np.fromiter(q.keys(), dtype=U64, count=len(q))
+    values = np.fromiter(q.values(), dtype=np.float32, count=len(q))
+    order = np.argsort(keys)
+    return keys[order], values[order]
+
+
+def lookup(table, keys):
+    """Q values for an array of keys out of a snapshot, 0 where missing"""
+    table_keys, table_values = table
+    if not len(table_keys):
+        return np.zeros(keys.shape, dtype=np.float32)
+    idx = np.searchsorted(table_keys, keys)
+    idx[idx == len(table_keys)] = 0
+    return np.where(table_keys[idx] == keys, table_values[idx], np.float32(0))
+
+
+class BatchSelfPlay:
+    """
+    Plays `games` games at once. With a `model` the moves are epsilon-greedy over
+    its Q values (epsilon defaults to model.epsilon), otherwise they're random.
+    The table is snapshotted when the batch starts, so a run is a pure function
+    of the snapshot and `seed`.
+    """
+    def __init__(self, games, model=None, epsilon=None, seed=0):
+        self.games = games
+        self.model = model
+        if epsilon is None:
+            epsilon = model.epsilon if model is not None else 1
+        self.epsilon = epsilon
+        self.rng = np.random.default_rng(seed)
+        self.table = snapshot(model) if model is not None else None
+
+    def choose(self, legal, keys):
+        """one column per game: random with probability epsilon, else the best Q value"""
+        noise = self.rng.random(legal.shape)
+        if self.table is None or self.epsilon >= 1:
+            return np.argmax(np.where(legal, noise, -1), axis=1)
+        # random tie-breaks between moves with the same value
+        values = lookup(self.table, keys) + noise * 1e-6
+        greedy = np.argmax(np.where(legal, values, -np.inf), axis=1)
+        explore = np.argmax(np.where(legal, noise, -1), axis=1)
+        return np.where(self.rng.random(len(legal)) < self.epsilon, explore, greedy)
+
+    def run(self):
+        """plays every game to the end and returns their Transitions"""
+        n = self.games
+        games = np.arange(n)
+        current = np.zeros(n, dtype=U64)
+        mask = np.zeros(n, dtype=U64)
+        first = np.zeros(n, dtype=U64)  # stones of the player that moved first
+        done = np.zeros(n, dtype=bool)
+        # row of each game's last move, so the loser's move can be punished
+        last_row = np.full(n, -1)
+
+        rows = []
+        count = 0
+        for ply in range(SIZE):
+            active = games[~done]
+            if not len(active):
+                break
+            cur, msk, fst = current[active], mask[active], first[active]
+            keys, _ = q_keys(msk + fst, mirror(msk) + mirror(fst))
+            legal = (msk[:, None] & TOPS[None, :]) == 0
+            cols = self.choose(legal, keys)
+
+            move = (msk + BOTTOMS[cols]) & COLUMN_MASKS[cols]
+            if ply % 2 == 0:
+                fst = fst | move
+            mover = cur | move
+            cur = cur ^ msk
+            msk = msk | move
+            won = alignment(mover)
+            ended = won | (msk == BOARD_MASK)
+            _, after = q_keys(msk + fst, mirror(msk) + mirror(fst))
+
+            reward = won.astype(np.int8)
+            this_row = count + np.arange(len(active))
+            rows.append((active, np.full(len(active), ply), keys[np.arange(len(active)), cols],
+                         after << U64(3), reward, ended, last_row[active]))
+            count += len(active)
+
+            last_row[active] = this_row
+            current[active], mask[active], first[active] = cur, msk, fst
+            done[active] = ended
+
+        game, plies, key, after, reward, ended, previous = (np.concatenate(col) for col in zip(*rows))
+        # the move before a winning move loses
+        losers = previous[(reward == 1) & (previous >= 0)]
+        reward[losers] = -1
+        return Transitions(game, plies, key, after, reward, ended)
+
+
+def update_model(model, transitions, table=None):
+    """
+    applies the TD rule of cli.AI.update_q_val to every transition at once:
+    Q = Q + alpha * (reward + best_future - Q), where best_future is minus the
+    best Q value the opponent has after the move (0 once the game is over).
+    Values are looked up in `table` (a fresh snapshot of model by default).
+    """
+    if table is None:
+        table = snapshot(model)
+    after_keys = transitions.after[:, None] | ACTIONS[None, :]
+    best_future = -np.maximum(lookup(table, after_keys).max(axis=1), 0)
+    best_future[transitions.done] = 0
+    reward = transitions.reward.astype(np.float32)
+    keep = (reward != 0) | (best_future != 0)
+    keys = transitions.key[keep]
+    old = lookup(table, keys)
+    new = old + model.alpha * (reward[keep] + best_future[keep] - old)
+    keys = keys.tolist()
+    model.q.update(zip(keys, new.tolist()))
+    model.dirty.update(keys)
+    model.q_changed()
+    return len(keys)
+
+
+def simulate(games, model=None, epsilon=None, seed=0):
+    """shortcut: plays `games` games with BatchSelfPlay and returns the transitions"""
+    return BatchSelfPlay(games, model, epsilon, seed).run()
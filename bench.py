@@ -0,0 +1,260 @@
+"""
+Benchmarks for the game engines.
+
+    python bench.py                       runs everything, writes bench_results.json
+    python bench.py --save-baseline       also stores the results as the baseline
+    python bench.py --baseline FILE       compares against FILE (bench_baseline.json)
+
+Five parts:
+    perft     node counts from fixed positions, checked against PERFT_EXPECTED
+    startup   imports/sec of cli in a fresh interpreter (workers import it on start)
+    micro     calls/sec of Game.makeMove, actions, someoneWins, connect4.result/winner
+    search    nodes/sec of connect4.minimax and AI.getBestFuture
+    training  self-play games/sec of train()
+Every rate is the median of a few repeats. The run fails
+(exit code 1) if a perft count is wrong or a rate drops more than --tolerance
+below the baseline; the parts in NOISY, which vary a lot from run to run on
+an unchanged tree, get the larger tolerance given there.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import cli
+import connect4 as c4
+from bitboard import Position
+
+# perft(position, depth) for depth 1, 2, ... A winning move is a leaf, it isn't expanded
+PERFT_EXPECTED = {
+    "empty": [7, 49, 343, 2401, 16807, 117649],
+    "sample1": [7, 43, 295, 1768, 11444],
+}
+
+PERFT_POSITIONS = {
+    "empty": [""] * cli.Game.width,
+    "sample1": cli.sample1,
+}
+
+# the least slowdown each part is allowed, whatever --tolerance says
+NOISY = {"startup": 0.5}
+
+
+def perft(pos, depth):
+    """number of positions `depth` moves ahead of `pos`"""
+    if depth == 0:
+        return 1
+    cols = pos.legal_columns()
+    if not cols:
+        return 1
+    nodes = 0
+    for col in cols:
+        if pos.is_winning_move(col):
+            nodes += 1
+            continue
+        pos.play(col)
+        nodes += perft(pos, depth - 1)
+        pos.undo()
+    return nodes
+
+
+def rate(fn, min_time=0.2, repeats=3):
+    """calls fn() (which returns how many operations it did) until `min_time`
+    has passed and returns operations per second, the median of `repeats` tries"""
+    rates = []
+    for i in range(repeats):
+        ops = 0
+        start = time.perf_counter()
+        while True:
+            ops += fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                rates.append(ops / elapsed)
+                break
+    return statistics.median(rates)
+
+
+def median_of(fn, repeats=3):
+    """runs fn() (which returns {name: rate}) `repeats` times, the median rate of each name"""
+    runs = [fn() for i in range(repeats)]
+    return {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+
+
+def midgame():
+    """a Game and a connect4 board a few moves in"""
+    game = cli.Game(state=list(cli.sample1), player=1, targets="10")
+    board = c4.initial_state()
+    for col in (3, 3, 2, 4, 4):
+        row = c4.h - [board[i][col] for i in range(c4.h)].count(c4.EMPTY)
+        board = c4.result(board, (row, col))
+    return game, board
+
+
+def bench_perft(repeats=3):
+    results = {}
+    for name, columns in PERFT_POSITIONS.items():
+        pos = Position.from_columns(columns)
+        times = []
+        for i in range(repeats):
+            counts = []
+            start = time.perf_counter()
+            for depth in range(1, len(PERFT_EXPECTED[name]) + 1):
+                counts.append(perft(pos, depth))
+            times.append(time.perf_counter() - start)
+        results[name] = {"counts": counts, "nodes_per_sec": sum(counts) / statistics.median(times)}
+    return results
+
+
+def bench_micro():
+    game, board = midgame()
+    cols = game.position.legal_columns()
+
+    def make_unmake():
+        for col in cols:
+            game.makeMove(col)
+            game.undoMove()
+        return len(cols)
+
+    def actions():
+        game.actions()
+        return 1
+
+    def someone_wins():
+        for col in cols:
+            game.someoneWins(col, "0")
+        return len(cols)
+
+    move = next(iter(c4.actions(board)))
+
+    def result():
+        c4.result(board, move)
+        return 1
+
+    def winner():
+        c4.winner(board)
+        return 1
+
+    return {
+        "Game.makeMove": rate(make_unmake),
+        "Game.actions": rate(actions),
+        "Game.someoneWins": rate(someone_wins),
+        "connect4.result": rate(result),
+        "connect4.winner": rate(winner),
+    }
+
+
+def search_once():
+    _, board = midgame()
+    start = time.perf_counter()
+    res = c4.search(board, max_nodes=50000)
+    minimax = res.nodes / (time.perf_counter() - start)
+
+    game, _ = midgame()
+    model = cli.AI()
+    start = time.perf_counter()
+    for col in game.actions():
+        model.getBestFuture(game, col)
+    future = model.nodes / (time.perf_counter() - start)
+    return {"connect4.minimax": minimax, "AI.getBestFuture": future}
+
+
+def bench_search(repeats=3):
+    return median_of(search_once, repeats)
+
+
+def bench_startup(runs=9):
+    """the median of `runs` imports of cli, each in a new interpreter"""
+    code = "import time; t = time.perf_counter(); import cli; print(time.perf_counter() - t)"
+    here = os.path.dirname(os.path.abspath(__file__))
+    median = statistics.median(float(subprocess.run([sys.executable, "-c", code], cwd=here, check=True,
+                                                    capture_output=True, text=True).stdout)
+                               for i in range(runs))
+    return {"import cli": 1 / median}
+
+
+def bench_training(games=10, repeats=3):
+    def once():
+        # the same games every time
+        random.seed(0)
+        model = cli.AI()
+        start = time.perf_counter()
+        for i in range(games):
+            cli.selfplay(model, verbose=False)
+        return {"train": games / (time.perf_counter() - start)}
+    return median_of(once, repeats)
+
+
+def run():
+    random.seed(0)
+    return {
+        "perft": bench_perft(),
+        "startup": bench_startup(),
+        "micro": bench_micro(),
+        "search": bench_search(),
+        "training": bench_training(),
+    }
+
+
+def rates(results):
+    """flattens every per-second number in `results` into {"part.name": rate}"""
+    flat = {}
+    for part in ("startup", "micro", "search", "training"):
+        for name, value in results.get(part, {}).items():
+            flat[f"{part}.{name}"] = value
+    for name, value in results["perft"].items():
+        flat[f"perft.{name}"] = value["nodes_per_sec"]
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """returns a list of failures: wrong perft counts and rates below baseline"""
+    failures = []
+    for name, expected in PERFT_EXPECTED.items():
+        if results["perft"][name]["counts"] != expected:
+            failures.append(f"perft {name}: got {results['perft'][name]['counts']}, expected {expected}")
+    if baseline is not None:
+        old = rates(baseline)
+        for name, value in rates(results).items():
+            allowed = max(tolerance, NOISY.get(name.split(".")[0], 0))
+            if name in old and value < old[name] * (1 - allowed):
+                failures.append(f"{name}: {value:.0f}/s is more than {allowed:.0%} below the baseline {old[name]:.0f}/s")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Connect4 engine benchmarks")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default="bench_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    results = run()
+    results["python"] = platform.python_version()
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    for name, value in rates(results).items():
+        print(f"{name:32} {value:14.0f}/s")
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print("FAIL", failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
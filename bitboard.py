@@ -0,0 +1,240 @@
+"""
+Bitboard position engine for Connect4.
+
+The board is kept in two integers:
+    `current` - the stones of the player to move
+    `mask`    - every stone on the board
+Each column takes HEIGHT + 1 bits (the extra bit on top is a sentinel so that
+shifts never wrap from one column into the next). Bit 0 of a column is the
+bottom cell, so a column of height h is the bit run `1 << h` - 1 moved into place.
+"""
+
+WIDTH = 7
+HEIGHT = 6
+H1 = HEIGHT + 1
+SIZE = WIDTH * HEIGHT
+
+# search order, centre first
+CENTRE_ORDER = [WIDTH // 2 + (1 - 2 * (i % 2)) * (i + 1) // 2 for i in range(WIDTH)]
+
+
+def bottom_mask(col):
+    return 1 << (col * H1)
+
+
+def top_mask(col):
+    return 1 << (HEIGHT - 1 + col * H1)
+
+
+def column_mask(col):
+    return ((1 << HEIGHT) - 1) << (col * H1)
+
+
+BOTTOM = sum(bottom_mask(c) for c in range(WIDTH))
+BOARD = BOTTOM * ((1 << HEIGHT) - 1)
+COLUMNS = [column_mask(c) for c in range(WIDTH)]
+# moves a cell of column c onto the same row of column WIDTH - 1 - c
+MIRROR_SHIFT = [(WIDTH - 1 - 2 * c) * H1 for c in range(WIDTH)]
+
+
+def _lines():
+    """bitmaps of the 69 ways to get four in a row"""
+    lines = []
+    for c in range(WIDTH):
+        for r in range(HEIGHT):
+            for dc, dr in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                cells = [(c + k * dc, r + k * dr) for k in range(4)]
+                if all(0 <= cc < WIDTH and 0 <= rr < HEIGHT for cc, rr in cells):
+                    lines.append(sum(1 << (cc * H1 + rr) for cc, rr in cells))
+    return lines
+
+
+LINES = _lines()
+# bit index of a cell -> how many lines go through it, the classic static value of a cell
+CELL_WEIGHT = {c * H1 + r: sum(line >> (c * H1 + r) & 1 for line in LINES)
+               for c in range(WIDTH) for r in range(HEIGHT)}
+
+
+def alignment(stones):
+    """returns True if `stones` contains four in a row"""
+    # horizontal
+    m = stones & (stones >> H1)
+    if m & (m >> (2 * H1)):
+        return True
+    # diagonal /
+    m = stones & (stones >> (H1 + 1))
+    if m & (m >> (2 * (H1 + 1))):
+        return True
+    # diagonal \
+    m = stones & (stones >> HEIGHT)
+    if m & (m >> (2 * HEIGHT)):
+        return True
+    # vertical
+    m = stones & (stones >> 1)
+    if m & (m >> 2):
+        return True
+    return False
+
+
+def winning_cells(stones, mask):
+    """
+    returns the bitmap of cells (empty or not) that would complete
+    four in a row for `stones`. `mask` is only used to drop filled cells.
+    """
+    # vertical
+    r = (stones << 1) & (stones << 2) & (stones << 3)
+    for shift in (H1, HEIGHT, H1 + 1):  # horizontal, and both diagonals
+        p = (stones << shift) & (stones << (2 * shift))
+        r |= p & (stones << (3 * shift))
+        r |= p & (stones >> shift)
+        p = (stones >> shift) & (stones >> (2 * shift))
+        r |= p & (stones << shift)
+        r |= p & (stones >> (3 * shift))
+    return r & (BOARD ^ mask)
+
+
+def mirror(bits):
+    """mirrors a bitmap left to right"""
+    out = 0
+    col = (1 << H1) - 1
+    for c in range(WIDTH):
+        out |= ((bits >> (c * H1)) & col) << ((WIDTH - 1 - c) * H1)
+    return out
+
+
+class Position:
+    """
+    A mutable Connect4 position with O(1) play/undo.
+    Scores and stones are always relative to the player to move.
+
+    `board_key` and `mirror_key` identify the position and its left-right
+    mirror image. They are kept up to date by play/undo instead of being
+    recomputed, see canonical().
+    """
+    __slots__ = ("current", "mask", "moves", "history", "board_key", "mirror_key")
+
+    def __init__(self, current=0, mask=0, moves=0):
+        self.current = current
+        self.mask = mask
+        self.moves = moves
+        self.history = []
+        # mask + the stones of whoever moved first. Like key() this is unique
+        # (see there), but it doesn't flip sides after every move
+        first = current if moves % 2 == 0 else current ^ mask
+        self.board_key = mask + first
+        self.mirror_key = mirror(mask) + mirror(first)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        builds a position out of `cli.Game` style column strings:
+        index 0 is the top of the column, "0" is the player to move, "1" the opponent
+        """
+        current = mask = moves = 0
+        for c, col in enumerate(columns):
+            for r, digit in enumerate(reversed(col)):
+                bit = 1 << (c * H1 + r)
+                mask |= bit
+                if digit == "0":
+                    current |= bit
+                moves += 1
+        return cls(current, mask, moves)
+
+    @classmethod
+    def from_moves(cls, moves):
+        """builds a position by playing a sequence of columns, e.g. "4453" or [4, 4, 5, 3]"""
+        pos = cls()
+        for col in moves:
+            pos.play(int(col))
+        return pos
+
+    def columns(self):
+        """inverse of from_columns"""
+        cols = []
+        for c in range(WIDTH):
+            col = ""
+            for r in range(HEIGHT):
+                bit = 1 << (c * H1 + r)
+                if not self.mask & bit:
+                    break
+                col = ("0" if self.current & bit else "1") + col
+            cols.append(col)
+        return cols
+
+    def copy(self):
+        pos = Position(self.current, self.mask, self.moves)
+        pos.history = list(self.history)
+        return pos
+
+    def key(self):
+        """
+        unique integer for the position (relative to the player to move).
+        Every column of mask + current is 2**h - 1 + (the stones in it), which
+        can't carry into the next column and can't be reached by any other height.
+        """
+        return self.current + self.mask
+
+    def canonical(self):
+        """
+        returns (key, mirrored) for the position: key is the same for a position
+        and its mirror image, mirrored tells if columns have to be flipped with
+        WIDTH - 1 - col to match it. Symmetric positions are never mirrored.
+        """
+        if self.mirror_key < self.board_key:
+            return self.mirror_key, True
+        return self.board_key, False
+
+    def opponent(self):
+        return self.current ^ self.mask
+
+    def can_play(self, col):
+        return not self.mask & top_mask(col)
+
+    def legal_mask(self):
+        """bitmap of the cells a stone can be dropped into"""
+        return (self.mask + BOTTOM) & BOARD
+
+    def legal_columns(self):
+        return [c for c in range(WIDTH) if not self.mask & top_mask(c)]
+
+    def play(self, col):
+        """drops a stone for the player to move into `col`. assumes the move is legal"""
+        move = (self.mask + bottom_mask(col)) & COLUMNS[col]
+        cell = move.bit_length() - 1
+        weight = 2 - (self.moves & 1)  # counted twice if the first player moves
+        self.board_key += weight << cell
+        self.mirror_key += weight << (cell + MIRROR_SHIFT[col])
+        self.current ^= self.mask
+        self.mask |= move
+        self.moves += 1
+        self.history.append(col)
+
+    def undo(self):
+        """takes back the last move"""
+        col = self.history.pop()
+        top = (self.mask & COLUMNS[col]).bit_length() - 1
+        self.mask ^= 1 << top
+        self.current ^= self.mask
+        self.moves -= 1
+        weight = 2 - (self.moves & 1)
+        self.board_key -= weight << top
+        self.mirror_key -= weight << (top + MIRROR_SHIFT[col])
+        return col
+
+    def winning_mask(self):
+        """playable cells that win right away for the player to move"""
+        return winning_cells(self.current, self.mask) & self.legal_mask()
+
+    def threat_mask(self):
+        """playable cells that would win right away for the opponent"""
+        return winning_cells(self.opponent(), self.mask) & self.legal_mask()
+
+    def is_winning_move(self, col):
+        return bool(self.winning_mask() & COLUMNS[col])
+
+    def has_won(self):
+        """True if the player that just moved has four in a row"""
+        return alignment(self.opponent())
+
+    def full(self):
+        return self.mask == BOARD
@@ -0,0 +1,154 @@
+"""
+Opening book.
+
+    python book.py --plies 6 --nodes 20000 --out book.c4b
+
+searches every position up to `--plies` moves into the game and stores the
+best move and score for each. A position and its mirror image are stored once
+(under Position.canonical()), so the book holds about half the positions.
+
+File layout (little endian):
+    header   8s magic, I version, I plies, Q count
+    keys     count * uint64, sorted canonical position keys
+    scores   count * int16, search.py scores for the player to move
+    moves    count * int8, best column for the canonical orientation
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from bitboard import WIDTH, Position
+from search import Searcher, TranspositionTable
+
+MAGIC = b"C4BOOK\0\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.c4b")
+
+
+def positions(plies):
+    """every canonical position with at most `plies` stones that isn't over yet"""
+    seen = set()
+    frontier = [Position()]
+    for ply in range(plies + 1):
+        nxt = []
+        for pos in frontier:
+            key = pos.canonical()[0]
+            if key in seen:
+                continue
+            seen.add(key)
+            yield pos
+            if ply == plies or pos.winning_mask():
+                continue  # the side to move wins here, nothing after is worth storing
+            for col in pos.legal_columns():
+                child = pos.copy()
+                child.play(col)
+                nxt.append(child)
+        frontier = nxt
+
+
+def generate(plies, path=DEFAULT_PATH, max_nodes=20000, verbose=True):
+    """builds the book for every position up to `plies` moves and writes it to `path`"""
+    tt = TranspositionTable()
+    entries = {}
+    start = time.perf_counter()
+    for pos in positions(plies):
+        res = Searcher(max_nodes=max_nodes, tt=tt).search(pos)
+        key, mirrored = pos.canonical()
+        move = WIDTH - 1 - res.move if mirrored else res.move
+        entries[key] = (move, res.score)
+        if verbose and len(entries) % 100 == 0:
+            print(f"{len(entries)} positions, {time.perf_counter() - start:.0f}s")
+
+    keys = array("Q", sorted(entries))
+    moves = array("b", [entries[k][0] for k in keys])
+    scores = array("h", [entries[k][1] for k in keys])
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, plies, len(keys)))
+        keys.tofile(f)
+        scores.tofile(f)
+        moves.tofile(f)
+    if verbose:
+        print(f"wrote {len(keys)} positions to {path}")
+    return len(keys)
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file. Nothing is read until the first probe,
+    and a missing file is just an empty book.
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.loaded = False
+        self.count = 0
+        self.plies = -1
+
+    def load(self):
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, plies, count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} opening book")
+        self.plies = plies
+        self.count = count
+        start = HEADER.size
+        view = memoryview(self.mm)
+        self.keys = view[start:start + 8 * count].cast("Q")
+        self.scores = view[start + 8 * count:start + 10 * count].cast("h")
+        self.moves = view[start + 10 * count:start + 11 * count].cast("b")
+
+    def __len__(self):
+        if not self.loaded:
+            self.load()
+        return self.count
+
+    def probe(self, pos):
+        """(best column, score) for `pos`, or None if it isn't in the book"""
+        if not self.loaded:
+            self.load()
+        if pos.moves > self.plies:
+            return None
+        key, mirrored = pos.canonical()
+        i = bisect.bisect_left(self.keys, key)
+        if i == self.count or self.keys[i] != key:
+            return None
+        move = self.moves[i]
+        if mirrored:
+            move = WIDTH - 1 - move
+        return move, self.scores[i]
+
+
+_default = None
+
+
+def default_book():
+    """the shared book at DEFAULT_PATH"""
+    global _default
+    if _default is None:
+        _default = OpeningBook()
+    return _default
+
+
+def main(argv=None):
+    import argparse  # only the command line needs it, importers of this module don't
+
+    parser = argparse.ArgumentParser(description="Builds the Connect4 opening book")
+    parser.add_argument("--plies", type=int, default=4, help="how many moves deep the book goes")
+    parser.add_argument("--nodes", type=int, default=20000, help="search budget per position")
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+    generate(args.plies, args.out, args.nodes)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Bounded caches.
+"""
+
+import itertools
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Holds at most `capacity` entries, dropping the least recently used one
+    when it's full. Counts hits, misses and evictions.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        try:
+            val = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def put(self, key, val):
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = val
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+        }
+
+
+class BoundedStore:
+    """
+    Dict-like map of at most `capacity` entries, or about `max_bytes` of
+    memory, that counts how often each entry is used (set, or read with get).
+    When it's full the `sample` least recently used entries are looked at and
+    the one with the fewest uses goes. The others have their counts halved
+    and go to the back of the queue, so uses from long ago fade.
+    `on_evict(key)` is called for every entry that's dropped.
+    """
+    # measured for int keys and float values on CPython 3.11, OrderedDict slot and entry list included
+    ENTRY_BYTES = 240
+
+    def __init__(self, capacity=None, max_bytes=None, sample=8, on_evict=None):
+        if capacity is None:
+            if max_bytes is None:
+                raise ValueError("needs a capacity or max_bytes")
+            capacity = max_bytes // self.ENTRY_BYTES
+        self.capacity = max(1, capacity)
+        self.sample = sample
+        self.on_evict = on_evict
+        # key -> [value, uses]
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, key):
+        return self.entries[key][0]
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        entry[1] += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def __setitem__(self, key, val):
+        entries = self.entries
+        entry = entries.get(key)
+        if entry is not None:
+            entry[0] = val
+            entry[1] += 1
+            entries.move_to_end(key)
+            return
+        if len(entries) >= self.capacity:
+            self.evict()
+        entries[key] = [val, 1]
+
+    def evict(self):
+        entries = self.entries
+        window = list(itertools.islice(entries.items(), self.sample))
+        victim = min(window, key=lambda item: item[1][1])[0]
+        for key, entry in window:
+            if key != victim:
+                entry[1] >>= 1
+                entries.move_to_end(key)
+        del entries[victim]
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(victim)
+
+    def uses(self, key):
+        entry = self.entries.get(key)
+        return 0 if entry is None else entry[1]
+
+    def update(self, other):
+        items = other.items() if hasattr(other, "items") else other
+        for key, val in items:
+            self[key] = val
+
+    def keys(self):
+        return self.entries.keys()
+
+    def values(self):
+        return (entry[0] for entry in self.entries.values())
+
+    def items(self):
+        return ((key, entry[0]) for key, entry in self.entries.items())
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "bytes": len(self.entries) * self.ENTRY_BYTES,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,158 @@
+"""
+Incremental training checkpoints.
+
+A checkpoint is a directory:
+    meta.json        games played, games between checkpoints, random's state
+                     and the files below in order
+    base-<n>.q       every Q value as of the last compaction
+    delta-<n>.q      Q values written since the checkpoint before it
+The .q files are qtable.py files with exact (float64) values.
+Each checkpoint only writes the keys in AI.dirty as a new delta segment, so it
+costs as much as the changes, not the table. Once `compact_after` segments
+have piled up a background thread merges them into a new base. meta.json is
+replaced atomically after the files it names are written, so a run killed at
+any point resumes from the last complete checkpoint; files it doesn't name
+are left overs and get ignored.
+
+Resuming plays out exactly like the run would have: the Q values and
+random's state are all a game depends on (AI.getBestFuture's cache only
+ever holds what searching again would give). cli.train also keeps
+checkpointing every meta.json's "every" games unless it's told otherwise.
+"""
+
+import json
+import os
+import random
+import threading
+
+from qtable import QTableFile, write_qtable
+
+VERSION = 1
+META = "meta.json"
+
+
+class Checkpoint:
+    """the checkpoint directory at `path`, created on the first write"""
+    def __init__(self, path, compact_after=8):
+        self.path = path
+        self.compact_after = compact_after
+        self.lock = threading.Lock()
+        self.compactor = None
+        self.meta = {"version": VERSION, "games": 0, "random": None, "base": None, "segments": [], "next": 0,
+                     "every": None}
+        if self.exists():
+            with open(self.file(META)) as f:
+                meta = json.load(f)
+            if meta.get("version") != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} checkpoint")
+            self.meta = meta
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def exists(self):
+        return os.path.exists(self.file(META))
+
+    @property
+    def games(self):
+        return self.meta["games"]
+
+    @property
+    def every(self):
+        """games between the checkpoints written so far, None if that wasn't recorded"""
+        return self.meta.get("every")
+
+    def new_file(self, prefix):
+        name = f"{prefix}-{self.meta['next']}.q"
+        self.meta["next"] += 1
+        return name
+
+    def save_meta(self):
+        tmp = self.file(META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.file(META))
+
+    def write(self, model, games, every=None):
+        """
+        records the Q values `model` changed since the last checkpoint (model.dirty,
+        which is cleared), the number of games played so far, `every` (the games
+        between checkpoints) and random's state
+        """
+        os.makedirs(self.path, exist_ok=True)
+        delta = {key: model.q[key] for key in model.dirty}
+        model.dirty.clear()
+        with self.lock:
+            if delta:
+                name = self.new_file("delta")
+                write_qtable(self.file(name), delta, exact=True)
+                self.meta["segments"].append(name)
+            self.meta["games"] = games
+            self.meta["every"] = every
+            self.meta["random"] = random.getstate()
+            self.save_meta()
+            pending = len(self.meta["segments"])
+        if pending >= self.compact_after:
+            self.compact()
+
+    def compact(self, wait=False):
+        """merges the base and the delta segments into a new base, in a background thread"""
+        if self.compactor is not None and self.compactor.is_alive():
+            if not wait:
+                return
+            self.compactor.join()
+        self.compactor = threading.Thread(target=self._compact, daemon=True)
+        self.compactor.start()
+        if wait:
+            self.compactor.join()
+
+    def _compact(self):
+        with self.lock:
+            base = self.meta["base"]
+            segments = list(self.meta["segments"])
+            if not segments:
+                return
+            name = self.new_file("base")
+        q = {}
+        for part in ([base] if base else []) + segments:
+            table = QTableFile(self.file(part))
+            q.update(table.items())
+            table.close()
+        write_qtable(self.file(name), q, exact=True)
+        with self.lock:
+            self.meta["base"] = name
+            self.meta["segments"] = self.meta["segments"][len(segments):]
+            self.save_meta()
+        for part in ([base] if base else []) + segments:
+            try:
+                os.remove(self.file(part))
+            except OSError:
+                pass  # still mapped somewhere that can't delete open files
+
+    def restore(self, model):
+        """
+        loads the checkpoint into the new cli.AI `model` (the base as its read-only
+        table, the segments on top) and sets random's state back to where it was.
+        Returns the number of games played before the checkpoint
+        """
+        with self.lock:
+            if self.meta["base"]:
+                model.table = QTableFile(self.file(self.meta["base"]))
+            for part in self.meta["segments"]:
+                table = QTableFile(self.file(part))
+                model.q.update(table.items())
+                table.close()
+            state = self.meta["random"]
+        model.dirty.clear()
+        model.q_changed()
+        if state is not None:
+            version, internal, gauss = state
+            random.setstate((version, tuple(internal), gauss))
+        return self.games
+
+    def close(self):
+        """waits for a compaction that's still running"""
+        if self.compactor is not None:
+            self.compactor.join()
@@ -3,17 +3,23 @@
 # the core of the program
 
 import random
+import time
 from copy import deepcopy
-import json
+from bitboard import WIDTH, HEIGHT, COLUMNS, Position, winning_cells
+from book import default_book
+import metrics
+from cache import BoundedStore, LRUCache
+from qtable import QTableFile, export_json, write_qtable
+from search import OutOfBudget, SearchResult
+from tablebase import default_tablebase
 
 #~~~ A note on the indexing for the connect4 grid.
 # the cols are indexed from 0 to 6, left to right
 # while the rows can be read from -1 to -6, down to up.
-random.seed(0)
 
 class Game:
-    width = 7
-    height = 6
+    width = WIDTH
+    height = HEIGHT
     colours = "YR"
     def __init__(self, state=None, player=None, targets=None):
         if state is None:
@@ -21,16 +27,22 @@ class Game:
         if player is None:
             player = random.randint(0, 1)
             targets = str(player) + str(1-player)
-        self.state = state
+        # the board itself lives in a bitboard (see bitboard.py); "0" in the
+        # column strings is always the player to move, "1" the opponent
+        self.position = Position.from_columns(state)
         self.player = player
         self.targets = targets
         self.winner = None
+
+    @property
+    def state(self):
+        return self.position.columns()
     
     def getStateTuple(self):
-        return tuple(self.state)
+        return tuple(self.position.columns())
     
     def getStateList(self):
-        return deepcopy(self.state)
+        return self.position.columns()
     
     def show(self):
         s = self.getStateTuple()
@@ -46,35 +58,25 @@ class Game:
         `action` is simply the int val for the col to add the number to
         assumes action is a legal move
         """
-        # print("state before", self.state)
-        # print("\t", self.targets[self.player])
-        self.state[action] = self.targets[self.player] + self.state[action]
-        if self.someoneWins(action, self.targets[self.player]):
-            print("yes", self.player, "wins. winning move: action", action)
+        wins = self.someoneWins(action, self.targets[self.player])
+        # swaps the sides as well, so "0" stays the player to move
+        self.position.play(action)
+        if wins:
             self.winner = self.player
         elif self.full():
-            # print("fullllllll", self.fu)
             self.winner = -1
-        # print("state after", self.state)
         self.player = 1-self.player
-        # Also, now, invert the bits
-        self.invertBits()
         self.targets = self.targets[::-1]
 
-    def invertBits(self):
-        new_cols = []
-        for i in self.state:
-            if i == "":
-                new_cols.append(i)
-                continue
-            new_col = str(int("1"*len(i)) - int(i))
-            new_col = "0" * (len(i) - len(new_col)) + new_col
-            new_cols.append(new_col)
-        self.state = new_cols
-
+    def undoMove(self):
+        """takes back the last move made with makeMove"""
+        self.position.undo()
+        self.winner = None
+        self.player = 1-self.player
+        self.targets = self.targets[::-1]
     
     def full(self):
-        return all([len(i) == 6 for i in self.getStateTuple()])
+        return self.position.full()
     
     def otherPlayer(self):
         """returns the index of the other player"""
@@ -90,107 +92,121 @@ class Game:
 
     def actions(self):
         """returns all the legal moves one can make"""
-
-        # Out of the cells which actually have space for a move,
-        emptyCols = [i for i in range(len(self.state)) if len(self.state[i]) <= 5]
-        #print("these are the empty cols", emptyCols)
+        pos = self.position
 
         # Sees if there's a winning move for current_player, if yes, returns it.
-        for i in emptyCols:
-            if self.someoneWins(i, self.player):
-                return [i]
+        wins = pos.winning_mask()
+        if wins:
+            return [i for i in range(Game.width) if wins & COLUMNS[i]][:1]
 
         # otherwise, finds if there are any winning moves for the opponent, blocks them
-        legality_bound = [i for i in emptyCols if self.someoneWins(i, self.otherPlayer())]
-        # print("legality bound", legality_bound)
-        # if len(legality_bound) > 1:
-            #print("Ha! You're under a trap! Need to perform all", legality_bound, "to win")
-        if len(legality_bound):
-            return legality_bound
-        else:
-            # No legality bound moves
-            return emptyCols
-
-
-    def getVal(self, index):
-        """given an index, gets the val associated with it or None.
-        expects index[1] to be a negative value ranging from -1 to -6"""
-        s = self.getStateTuple()
-        try:
-            return s[index[0]][index[1]] if len(s[index[0]]) >= -index[1] else None
-        except IndexError:
-            return None
-    
-    def applyVector(self, vector, state):
-        """applies `vector` on `state` and returns the new state as a tuple"""
-        new_index = tuple([sum(i) for i in zip(vector, state)])
-        if new_index[0] < 0 or new_index[0] > 6 or new_index[1] > -1 or new_index[1] < -6:
-            return None
-        return new_index
+        threats = pos.threat_mask()
+        if threats:
+            return [i for i in range(Game.width) if threats & COLUMNS[i]]
 
+        # No legality bound moves
+        return pos.legal_columns()
     
     def someoneWins(self, action, target: str):
         """
-        this program doesn't have a standard victory check algo as that's quite expensive
-        instead, it sees if the `action` leads to a victory.
+        sees if dropping a stone of `target` ("0" for the player to move,
+        "1" for the opponent) into `action` leads to a victory.
         Thus, it assumes that the game hadn't been won before `action`
-        IDEA:
-        1) starts from `action` with the vectors for NE, E, SE, S, SW, W, NW and graphs consecutive vectors
-        of the same colour. if any of them have a length greater than 4, return true right away
-        2) having mapped everything, sees if the conjunction of the opposites leads to a sequence >= 4
         """
-        target = str(target)
-        # print("seeing if", target, "wins upon action", action)
-        vectors = [(1, -1), (1, 0), (1, 1)]
-        action_index = (action, -(len(self.state[action])+1))
-        for vector in vectors:
-            dirs = [(vector, action_index), (tuple([-1*i for i in vector]), action_index)]
-            chain_len = 1
-            #print(vector)
-            while dirs and chain_len != 4:
-                current_vector = dirs.pop()  # remember this is a tuple of the vector and the index
-                #print("considering vector, intial", current_vector)
-                new_index = self.applyVector(*current_vector) # get the new_index by adding the vector to the index
-                if new_index is None:
-                    continue
-                #print("\tthis is the new index", new_index)
-                if self.getVal(new_index) == target:
-                    #print("\t  equals target", target)
-                    dirs.append((current_vector[0], new_index))
-                    chain_len += 1
-                #print("chain length", chain_len)
-            if chain_len >= 4:
-                #print("\ttrue")
-                return True
-        # now take care of the vector pointing downwards
-        try:
-            other_index = list(reversed(self.state[action])).index(str(self.otherTarget(int(target))))
-            #print("\t", other_index + 1 >= 4)
-            return other_index + 1 >= 4
-        except ValueError:
-            #print("\t", len(self.state[action]) + 1 >= 4)
-            return len(self.state[action]) + 1 >= 4
+        pos = self.position
+        stones = pos.current if str(target) == "0" else pos.opponent()
+        return bool(winning_cells(stones, pos.mask) & pos.legal_mask() & COLUMNS[action])
     
 
 class AI:
-    def __init__(self, alpha=0.9, epsilon=0):
-        self.q = {}
+    def __init__(self, alpha=0.9, epsilon=0, table=None, use_book=True, cache_size=100000,
+                 use_tablebase=True, max_entries=None, max_bytes=None):
         self.alpha = alpha
         self.epsilon = epsilon
+        # read-only values from a saved Q-table file, self.q takes precedence
+        self.table = table
+        # keys written since whoever reads this last cleared it
+        self.dirty = set()
+        # with a cap the least used values are dropped to stay under it,
+        # see self.q.stats() for how that goes
+        if max_entries is None and max_bytes is None:
+            self.q = {}
+        else:
+            self.q = BoundedStore(max_entries, max_bytes, on_evict=self.dirty.discard)
+        # positions expanded by getBestFuture, and the results it worked out
+        self.nodes = 0
+        self.cache = LRUCache(cache_size)
+        # bumped on every write to the Q values, a cached result is only good
+        # while it's still the generation it was worked out in
+        self.generation = 0
+        # the opening book is looked at before searching when playing for real
+        self.book = default_book() if use_book else None
+        # exact results for endgames, getBestFuture stops there
+        self.tablebase = default_tablebase() if use_tablebase else None
+        self.tablebase_from = self.tablebase.first_move() if use_tablebase else Game.width * Game.height + 1
+        # set while an anytime search runs, see anytime_action
+        self.deadline = None
+        self.last_search = None
+        self.cut_off = False
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """opens a Q-table written by `save` without reading it into memory"""
+        return cls(table=QTableFile(path), **kwargs)
+
+    def save(self, path, js_out=None):
+        """writes the Q-table (the loaded file and all new values) to `path`,
+        and optionally a json copy to `js_out` for debugging"""
+        q = self.q
+        if self.table is not None:
+            q = dict(self.table.items())
+            q.update(self.q)
+        write_qtable(path, q)
+        if js_out is not None:
+            export_json(js_out, q)
     
+    @staticmethod
+    def key(state: Game, action):
+        """the Q-table key for playing `action` in `state`: a single int.
+        A position and its mirror image share a key (with the action flipped
+        to match), and the position part is kept up to date by makeMove"""
+        position_key, mirrored = state.position.canonical()
+        if mirrored:
+            action = Game.width - 1 - action
+        elif position_key == state.position.mirror_key:
+            # symmetric position, both halves of the board are the same
+            action = min(action, Game.width - 1 - action)
+        return position_key << 3 | action
+
     def update_q_val(self, state: Game, action, reward, best_future, old_val):
         """Q(s, a) = Q(s, a) + alpha * [r + max(Q(s', a')) - Q(s, a)]
-        -> Q(key) = Q(key) + alpha * [reward + best_future - Q(key)]
-        make sure key is a tuple (immutable) as dict keys need to be immutable"""
+        -> Q(key) = Q(key) + alpha * [reward + best_future - Q(key)]"""
         if best_future == 0 and reward == 0:
             return
-        key = (state.getStateTuple(), action)
+        key = AI.key(state, action)
         self.q[key] = old_val + self.alpha * (reward + best_future - old_val)
+        self.dirty.add(key)
+        self.generation += 1
+
+    def q_changed(self):
+        """to be called after writing Q values other than through update_q_val
+        (merging, loading), so getBestFuture doesn't use results from before"""
+        self.generation += 1
     
     def get_q_val(self, state: Game, action, key=None):
         if key is None:
-            key = (state.getStateTuple(), action)
-        return self.q.get(key, 0)
+            key = AI.key(state, action)
+        val = self.q.get(key)
+        if val is None:
+            if self.table is None:
+                return 0
+            return self.table.get(key, 0)
+        return val
+
+    def q_vals(self, state: Game, actions):
+        """the Q values of all of `actions` in `state`, in the same order.
+        Backends that can score several moves at once override this"""
+        return [self.get_q_val(state, action) for action in actions]
     
     def update(self, state: Game, action, reward):
         """both state and action are tuples"""
@@ -200,109 +216,335 @@ class AI:
             self.update_q_val(state, action, reward, best_future, old_val)
     
     def getBestFuture(self, state: Game, action, depth=4):
-        """again, state and action are tuples"""
+        """the value of playing `action` in `state`, looking `depth` moves ahead.
+        Results are remembered in self.cache by (position, action, depth), but
+        only those of searches that wrote no Q values, and only until the next
+        write, so a cached result is always what searching again would give.
+        self.cut_off is set if a line had to stop at the horizon, found in the
+        cache or not.
+        `state` is played on and taken back, it's left as it was"""
         if depth <= 0:
+            self.cut_off = True
             return self.get_q_val(state, action)
+
+        key = AI.key(state, action) << 6 | depth
+        cached = self.cache.get(key)
+        if cached is not None and cached[2] == self.generation:
+            val, cut_off, generation = cached
+            self.cut_off = self.cut_off or cut_off
+            return val
         
-        best = 0
-        for act in state.actions():
-            new_state = Game(state.getStateList(), state.player, state.targets)
-            new_state.makeMove(action)
-            val = self.get_q_val(new_state, act)
-            if val == 0:
-                val = self.getBestFuture(new_state, act, depth=depth-1)
-                if val != 0:
-                    self.update_q_val(new_state, act, 0, -val, 0)
-            if val > best:
-                best = val
+        self.nodes += 1
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise OutOfBudget()
+        outer_cut_off = self.cut_off
+        self.cut_off = False
+        generation = self.generation
+        state.makeMove(action)
+        try:
+            best = 0
+            exact = None
+            if state.winner is None and state.position.moves >= self.tablebase_from:
+                exact = self.tablebase.probe(state.position)
+            if exact is not None:
+                # -1, 0 or 1 for the player to move after `action`
+                best = (exact > 0) - (exact < 0)
+            elif state.winner is None:
+                actions = state.actions()
+                vals = self.q_vals(state, actions)
+                for i, act in enumerate(actions):
+                    val = vals[i]
+                    if val == 0:
+                        val = self.getBestFuture(state, act, depth=depth-1)
+                        if val != 0:
+                            self.update_q_val(state, act, 0, -val, 0)
+                            # that can change the values still to come (a mirror image's key, say)
+                            vals[i + 1:] = self.q_vals(state, actions[i + 1:])
+                    if val > best:
+                        best = val
+        finally:
+            state.undoMove()
+        if self.generation == generation:
+            self.cache.put(key, (-best, self.cut_off, generation))
+        self.cut_off = self.cut_off or outer_cut_off
         return -best
     
-    def choose_action(self, state: Game, train=True):
+    def best_action(self, state: Game, depth=4):
+        """the action with the best value looking `depth` moves ahead, and that value"""
+        best = None
+        best_action = None
+        actions = state.actions()
+        for action, val in zip(actions, self.q_vals(state, actions)):
+            if val == 0:
+                val = self.getBestFuture(state, action, depth)
+            if best is None or val > best:
+                best = val
+                best_action = action
+        return best_action, best
+
+    def anytime_action(self, state: Game, time_limit):
+        """
+        deepens best_action one move at a time until `time_limit` seconds are up
+        and returns the action of the deepest search that finished.
+        The depth reached and the nodes used are left in self.last_search.
+        """
+        start_nodes = self.nodes
+        self.deadline = time.perf_counter() + time_limit
+        actions = state.actions()
+        action, val = actions[0], 0
+        reached = 0
+        try:
+            for depth in range(1, Game.width * Game.height - state.position.moves + 1):
+                if len(actions) == 1:
+                    break  # nothing to think about
+                self.cut_off = False
+                action, val = self.best_action(state, depth)
+                reached = depth
+                if not self.cut_off:
+                    break  # every line ends before this depth, going deeper won't change anything
+        except OutOfBudget:
+            pass
+        finally:
+            self.deadline = None
+        self.last_search = SearchResult(action, val, reached, self.nodes - start_nodes)
+        return action
+
+    def choose_action(self, state: Game, train=True, time_limit=None):
+        """
+        picks a move for `state`. With train=False it plays the best move it can
+        find: from the opening book, else with a depth 4 search, or with an
+        anytime search of `time_limit` seconds if one is given
+        """
         if not train:  # when we're playing for real:
-            best = None
-            best_action = None
-            for action in state.actions():
-                val = self.get_q_val(state, action)
-                if val == 0:
-                    val = self.getBestFuture(state, action)
-                if best is None or val > best:
-                    best = val
-                    best_action = action
-            return best_action
+            if self.book is not None:
+                hit = self.book.probe(state.position)
+                if hit is not None and hit[0] in state.actions():
+                    return hit[0]
+            if time_limit is not None:
+                return self.anytime_action(state, time_limit)
+            return self.best_action(state)[0]
         # otherwise, explore.
-        actions = [i for i in state.actions() if self.get_q_val(state, i) == 0]
-        return random.choice(actions)
+        legal = state.actions()
+        actions = [i for i, val in zip(legal, self.q_vals(state, legal)) if val == 0]
+        return random.choice(actions or legal)
         
 
                 
  
 
-def train(n, js_out="map.json"):
-
-    model = AI()
-    
-    for i in range(n):
-        print("Playing Game", i)
-
-        game = Game()
+def selfplay(model: AI, verbose=False, log=None):
+    """plays one game of `model` against itself, updating it as it goes.
+    The moves are appended to `log` (a gamelog.GameLogWriter) if one is given"""
+    game = Game()
+    moves = []
 
-        last_moves = {
-            0: {"state": None, "action": None},
-            1: {"state": None, "action": None}
-        }
+    last_moves = {
+        0: {"state": None, "action": None},
+        1: {"state": None, "action": None}
+    }
 
-        while True:
+    while True:
+        if verbose:
             print("state is:", game.getStateTuple())
             game.show()
 
-            # choose the best move
-            action = model.choose_action(game)
+        # choose the best move
+        action = model.choose_action(game)
+        if verbose:
             print("\tchose action", action)
 
-            # update the last move by the player
-            last_moves[game.player]["state"] = deepcopy(game)
-            last_moves[game.player]["action"] = action
-
-            # and move onto the new state
-            game.makeMove(action)
-            # print("game after move:", game.getStateTuple())
-            # print("full?", game.full(), "winner?", game.winner)
-            if game.winner is not None:
+        # update the last move by the player
+        last_moves[game.player]["state"] = deepcopy(game)
+        last_moves[game.player]["action"] = action
+
+        # and move onto the new state
+        game.makeMove(action)
+        moves.append(action)
+        # print("game after move:", game.getStateTuple())
+        # print("full?", game.full(), "winner?", game.winner)
+        if game.winner is not None:
+            if verbose:
                 print("winner's been found:", game.player)
-                # then give the last move a positive reward
-                # print("these are the params:", last_moves[game.otherPlayer()]["state"],
-                    # last_moves[game.otherPlayer()]["action"],
-                    # 1)
-                model.update(
-                    last_moves[game.otherPlayer()]["state"],
-                    last_moves[game.otherPlayer()]["action"],
-                    1)
-                # and the move before that a negative value; be careful in case the move doesn't exist
-                try:
-                    model.update(
-                        last_moves[game.player]["state"],
-                        last_moves[game.player]["action"],
-                        -1
-                    )
-                except:
-                    pass
-                break
-            else:   # no reward, just update (in case bestFuture exists)
-                # print("general update~")
+            # then give the last move a positive reward
+            model.update(
+                last_moves[game.otherPlayer()]["state"],
+                last_moves[game.otherPlayer()]["action"],
+                1)
+            # and the move before that a negative value; be careful in case the move doesn't exist
+            try:
                 model.update(
-                    last_moves[game.otherPlayer()]["state"],
-                    last_moves[game.otherPlayer()]["action"],
-                    1)
+                    last_moves[game.player]["state"],
+                    last_moves[game.player]["action"],
+                    -1
+                )
+            except:
+                pass
+            break
+        else:   # no reward, just update (in case bestFuture exists)
+            # print("general update~")
+            model.update(
+                last_moves[game.otherPlayer()]["state"],
+                last_moves[game.otherPlayer()]["action"],
+                1)
+    if log is not None:
+        log.write(moves)
+    metrics.count("games")
+    metrics.count("plies", len(moves))
+
+
+def train(n, out="map.q", js_out=None, log=None, compress_log=False,
+          checkpoint=None, checkpoint_every=None, resume=None, model=None,
+          verbose=False, report=None, report_every=10.0):
+    """plays `n` games of self-play and saves the model to `out`.
+    With `log` every game is also appended to that game log (see gamelog.py).
+    With `checkpoint` (a directory) the changes are saved every `checkpoint_every`
+    games, 100 by default (see checkpoint.py); `resume` picks a run up from such
+    a directory, model and random state, and carries on until `n` games have been
+    played in all, checkpointing to the same place unless `checkpoint` says
+    otherwise and as often as before unless `checkpoint_every` does.
+    `model` is the AI to train, a new one by default (e.g. an ntuple.NTupleAI).
+    Nothing is printed unless `verbose`; `report` is a json lines file that
+    gets the metrics (see metrics.py) every `report_every` seconds"""
+
+    # imported here: gamelog imports this module, and the rest only matter to training
+    from checkpoint import Checkpoint
+    from gamelog import GameLogWriter
+
+    if model is None:
+        model = AI()
+    if (checkpoint is not None or resume is not None) and model.q is None:
+        raise ValueError("checkpoints only hold the Q values of a tabular AI")
+    start = 0
+    if resume is not None:
+        source = Checkpoint(resume)
+        if not source.exists():
+            raise FileNotFoundError(f"{resume} is not a checkpoint directory")
+        start = source.restore(model)
+        if checkpoint is None:
+            checkpoint = resume
+        if checkpoint_every is None:
+            checkpoint_every = source.every
+    if checkpoint_every is None:
+        checkpoint_every = 100
+    saver = Checkpoint(checkpoint) if checkpoint is not None else None
+    writer = GameLogWriter(log, compress_log) if log is not None else None
+    reporter = metrics.Reporter(report, report_every, model) if report is not None else None
+    
+    try:
+        for i in range(start, n):
+            if verbose:
+                print("Playing Game", i)
+            selfplay(model, verbose, log=writer)
+            if saver is not None and (i + 1) % checkpoint_every == 0:
+                saver.write(model, i + 1, checkpoint_every)
+            if reporter is not None:
+                reporter.tick()
+    finally:
+        if writer is not None:
+            writer.close()
+        if saver is not None:
+            saver.close()
+        if reporter is not None:
+            reporter.close()
     
-    with open(js_out, "w") as f:
-        json.dump({str(i):str(model.q[i]) for i in sorted(model.q)}, f, indent=2)
+    model.save(out, js_out)
     
     return model
 
 
-def play(model: AI):
+def _train_worker(conn, seed, alpha, log):
     """
-    Takes the model and plays the game
+    runs in a child process of train_parallel: gets (merged updates, games)
+    from `conn`, plays that many games and sends back the Q values it changed
+    """
+    random.seed(seed)
+    from gamelog import GameLogWriter
+
+    model = AI(alpha=alpha)
+    writer = GameLogWriter(log) if log is not None else None
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        merged, games = msg
+        model.q.update(merged)
+        model.q_changed()
+        model.dirty.clear()
+        for i in range(games):
+            selfplay(model, log=writer)
+        conn.send({key: model.q[key] for key in model.dirty})
+    if writer is not None:
+        writer.close()
+    conn.close()
+
+
+def train_parallel(n, workers=None, sync_every=20, seed=0, out="map.q", js_out=None, alpha=0.9, log=None,
+                   verbose=False):
+    """
+    Same as train, but plays the games over `workers` processes (all cores by default).
+    Every worker plays `sync_every` games on its own copy of the table, then the
+    changes of all workers are merged into the master table (values written by
+    more than one worker are averaged) and sent back out before the next round.
+    Workers are seeded from `seed` and merged in a fixed order, so a run only
+    depends on `seed`, `workers` and `sync_every`.
+    With `log`, worker i appends its games to the game log `log`.i
+    """
+    import multiprocessing
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    model = AI(alpha=alpha)
+
+    pipes = []
+    procs = []
+    for i in range(workers):
+        parent, child = multiprocessing.Pipe()
+        p = multiprocessing.Process(target=_train_worker, args=(child, f"{seed}-{i}", alpha, None if log is None else f"{log}.{i}"), daemon=True)
+        p.start()
+        child.close()
+        pipes.append(parent)
+        procs.append(p)
+
+    merged = {}
+    played = 0
+    try:
+        while played < n:
+            # hand out this round's games, the last round may be a short one
+            left = n - played
+            games = [min(sync_every, max(0, left - i * sync_every)) for i in range(workers)]
+            for conn, count in zip(pipes, games):
+                conn.send((merged, count))
+            played += sum(games)
+            if verbose:
+                print("Playing Games", played - sum(games), "to", played - 1)
+
+            changes = {}
+            for conn in pipes:
+                for key, val in conn.recv().items():
+                    changes.setdefault(key, []).append(val)
+            merged = {key: sum(vals) / len(vals) for key, vals in changes.items()}
+            model.q.update(merged)
+    finally:
+        for conn in pipes:
+            try:
+                conn.send(None)
+            except OSError:
+                pass  # that worker is gone already, whatever went wrong is raised above
+            conn.close()
+        for p in procs:
+            p.join()
+
+    model.save(out, js_out)
+
+    return model
+
+
+def play(model: AI, time_limit=None):
+    """
+    Takes the model and plays the game.
+    `model` is an AI, or another engine with the same choose_action (mcts.MCTS,
+    server.Client).
+    `time_limit` caps the seconds the AI may think per move
     """
     human = random.randint(0, 1)
     who = {human: "Human", 1-human: "AI"}
@@ -324,7 +566,7 @@ def play(model: AI):
                     print("val must be an int")
             game.makeMove(x)
         else:
-            move = model.choose_action(game, train=False)
+            move = model.choose_action(game, train=False, time_limit=time_limit)
             game.makeMove(move)
         
     print("Game over. game.winner", game.winner)
@@ -340,10 +582,127 @@ def play(model: AI):
 
 
 sample1 = ["00", "100", "010", "", "", "11", "001"]
-x = Game(state=sample1, player=1, targets="10")
-x.show()
-trained = train(1)
-play(trained)
+
+
+def main(argv=None):
+    """
+    python cli.py                       trains one game and plays against you
+    python cli.py train 500 --workers 4 --checkpoint run.ckpt
+    python cli.py train 500 --metrics train.jsonl --profile train.prof
+    python cli.py play --qtable map.q --time 2
+    python cli.py play --mcts --workers 4
+    python cli.py analyze positions.txt  (see analyze.py)
+    python cli.py bench                  (see bench.py)
+    Everything heavy is imported by the command that needs it, so importing
+    this module stays quick and does nothing else.
+    """
+    import argparse
+    import contextlib
+    import sys
+
+    parser = argparse.ArgumentParser(description="Connect4 against a Q-learning AI")
+    commands = parser.add_subparsers(dest="command")
+
+    p = commands.add_parser("train", help="self-play training")
+    p.add_argument("games", type=int)
+    p.add_argument("--out", default="map.q")
+    p.add_argument("--json", default=None, help="also dump the table as json")
+    p.add_argument("--workers", type=int, default=1, help="more than 1 trains with train_parallel")
+    p.add_argument("--log", default=None, help="append the games to this game log")
+    p.add_argument("--checkpoint", default=None, help="checkpoint directory")
+    p.add_argument("--every", type=int, default=None, help="games between checkpoints, 100 or as the resumed run")
+    p.add_argument("--resume", default=None, help="carry on from this checkpoint directory")
+    p.add_argument("--max-mb", type=float, default=None, help="cap on the Q-table's memory, least used values go first")
+    p.add_argument("--ntuple", action="store_true", help="train an n-tuple network (see ntuple.py) instead of a Q-table")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--verbose", action="store_true", help="print every game and move")
+    p.add_argument("--metrics", default=None, help="json lines file for counters and timings (see metrics.py)")
+    p.add_argument("--report-every", type=float, default=10.0, help="seconds between metrics lines")
+    p.add_argument("--profile", default=None, help="dump cProfile stats here")
+
+    p = commands.add_parser("play", help="play against the AI")
+    p.add_argument("--qtable", default=None, help="Q-table written by train, else one game is trained first")
+    p.add_argument("--time", type=float, default=None, help="seconds the AI may think per move")
+    p.add_argument("--ntuple", default=None, help="n-tuple network written by train --ntuple")
+    p.add_argument("--server", action="store_true", help="play against a running server.py")
+    p.add_argument("--mcts", action="store_true", help="play against mcts.MCTS (--time a move, 1s by default)")
+    p.add_argument("--workers", type=int, default=1, help="processes for --mcts")
+    p.add_argument("--seed", type=int, default=0)
+
+    # these two hand their arguments on to their own modules
+    commands.add_parser("analyze", help="analyse a file of positions, see analyze.py")
+    commands.add_parser("bench", help="run the benchmarks, see bench.py")
+
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "analyze":
+        import analyze
+        return analyze.main(argv[1:])
+    if argv and argv[0] == "bench":
+        import bench
+        return bench.main(argv[1:])
+    args = parser.parse_args(argv or ["play"])
+
+    random.seed(args.seed)
+    if args.command == "train":
+        # options the chosen kind of training has no use for
+        if args.ntuple:
+            kind, unused = "--ntuple", [("--json", args.json), ("--checkpoint", args.checkpoint),
+                                        ("--resume", args.resume), ("--max-mb", args.max_mb),
+                                        ("--workers", args.workers > 1)]
+        elif args.workers > 1:
+            kind, unused = "--workers", [("--checkpoint", args.checkpoint), ("--resume", args.resume),
+                                         ("--max-mb", args.max_mb), ("--metrics", args.metrics),
+                                         ("--profile", args.profile)]
+        else:
+            kind, unused = None, []
+        unused = [flag for flag, value in unused if value]
+        if unused:
+            parser.error(f"train {kind} can't be used with {', '.join(unused)}")
+        if args.resume:
+            from checkpoint import Checkpoint
+            if not Checkpoint(args.resume).exists():
+                parser.error(f"--resume {args.resume} is not a checkpoint directory")
+        if args.metrics:
+            metrics.enable()
+        report = dict(verbose=args.verbose, report=args.metrics, report_every=args.report_every)
+        with metrics.profile(args.profile) if args.profile else contextlib.nullcontext():
+            if args.ntuple:
+                from ntuple import NTupleAI
+                train(args.games, args.out, log=args.log, model=NTupleAI(), **report)
+            elif args.workers > 1:
+                train_parallel(args.games, args.workers, seed=args.seed, out=args.out, js_out=args.json,
+                               log=args.log, verbose=args.verbose)
+            else:
+                model = AI(max_bytes=int(args.max_mb * 1e6)) if args.max_mb else None
+                train(args.games, args.out, args.json, args.log, checkpoint=args.checkpoint,
+                      checkpoint_every=args.every, resume=args.resume, model=model, **report)
+        return 0
+
+    if args.server:
+        import server
+        if not server.available():
+            sys.exit("no server running, start one with python server.py")
+        model = server.Client()
+    elif args.mcts:
+        from mcts import MCTS
+        model = MCTS(time_limit=args.time or 1.0, workers=args.workers, seed=args.seed)
+    elif args.qtable:
+        model = AI.load(args.qtable)
+    elif args.ntuple:
+        from ntuple import NTupleAI
+        model = NTupleAI.load(args.ntuple)
+    else:
+        model = train(1)
+    play(model, args.time)
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    # so that `import cli` elsewhere (metrics, gamelog, ...) gets these classes, not a second copy
+    sys.modules.setdefault("cli", sys.modules[__name__])
+    raise SystemExit(main())
 # #print(x.currentTarget())
 # #print(x.otherPlayer(x.currentTarget()))
 # x.makeMove(3)
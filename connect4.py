@@ -3,7 +3,11 @@ Connect4 Player
 """
 
 import math
-import copy
+
+from bitboard import H1, Position, alignment
+from book import default_book
+from search import Searcher, SearchResult
+from tablebase import default_tablebase
 
 R = "R"
 Y = "Y"
@@ -12,16 +16,92 @@ w = 7
 h = 6
 
 
+class Board(list):
+    """
+    A board that can be played on in place: a list of h rows of w cells, row 0
+    at the bottom, like the boards the functions below take, plus the side to
+    move, the column heights and a bitboard Position kept up to date.
+    play(col)/undo() change it without copying, copy() and snapshot() are for
+    callers that need a board of their own.
+    """
+    def __init__(self, rows=None):
+        if rows is None:
+            super().__init__([EMPTY] * w for _ in range(h))
+            self.turn = R
+            self.heights = [0] * w
+            self.position = Position()
+        else:
+            super().__init__(list(row) for row in rows)
+            self.turn = count_turn(self)
+            self.heights = [h - [self[i][j] for i in range(h)].count(EMPTY) for j in range(w)]
+            self.position = bits_position(self, self.turn)
+        self.history = []
+
+    def copy(self):
+        b = Board.__new__(Board)
+        list.__init__(b, (row[:] for row in self))
+        b.turn = self.turn
+        b.heights = self.heights[:]
+        b.position = self.position.copy()
+        b.history = self.history[:]
+        return b
+
+    def snapshot(self):
+        """an immutable copy of the cells"""
+        return tuple(tuple(row) for row in self)
+
+    def play(self, col):
+        """drops a stone for the player to move into column `col`"""
+        row = self.heights[col]
+        if row >= h:
+            raise ValueError("action is not valid")
+        self[row][col] = self.turn
+        self.heights[col] = row + 1
+        self.turn = Y if self.turn == R else R
+        self.position.play(col)
+        self.history.append(col)
+
+    def undo(self):
+        """takes back the last move"""
+        col = self.history.pop()
+        self.heights[col] -= 1
+        self[self.heights[col]][col] = EMPTY
+        self.turn = Y if self.turn == R else R
+        self.position.undo()
+        return col
+
+    def actions(self):
+        return {(self.heights[j], j) for j in range(w) if self.heights[j] < h}
+
+    def winner(self):
+        # only the player that just moved can have four in a row
+        if self.position.has_won():
+            return Y if self.turn == R else R
+        return None
+
+    def full(self):
+        return self.position.full()
+
+
+def as_board(board):
+    """
+    Returns `board` as a Board, without copying it if it already is one.
+    """
+    if isinstance(board, Board):
+        return board
+    return Board(board)
+
+
 def initial_state():
     """
     Returns starting state of the board.
     """
-    return [[EMPTY]*w]*h
+    return Board()
 
 
-def player(board):
+def count_turn(board):
     """
-    Returns player who has the next turn on a board.
+    Counts the stones to find who plays next: R moves first.
     """
     every = []
     for row in board:
@@ -30,58 +110,76 @@ def player(board):
         return Y
     return R
 
-def inverse(board):
+
+def player(board):
     """
-    Returns the inverse of the board.
+    Returns player who has the next turn on a board.
     """
-    inv = [[]]*w
-    for i in range(w):
-        inv[i] = [board[j][i] for j in range(h)]
-    return inv
+    if isinstance(board, Board):
+        return board.turn
+    return count_turn(board)
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    possible = set()  # set of possible values
-    inv = inverse(board)  # inverse of the board. I know realise this may not have been necessary after all
-    # look over all the columns, get the position of the first empty spot. add that as a possibility.
-    for column in range(len(inv)):
-        get_col = h - inv[column].count(EMPTY)
-        if get_col < h:
-            possible.add((get_col, column))
-    return possible
-
+    return as_board(board).actions()
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    turn = player(board)
-    # b = [[EMPTY]*3]*3
-    b_copy = copy.deepcopy(board)
-    if b_copy[action[0]][action[1]] == EMPTY:
-        b_copy[action[0]][action[1]] = turn
-        return b_copy
-    else:
+    b = as_board(board).copy()
+    if b.heights[action[1]] != action[0]:
         raise ValueError("action is not valid")
+    b.play(action[1])
+    return b
+
+
+def stones(board, mark):
+    """
+    Returns the bitboard (see bitboard.py) of the cells holding `mark`.
+    Row 0 is the bottom of the board.
+    """
+    bits = 0
+    for i in range(h):
+        for j in range(w):
+            if board[i][j] == mark:
+                bits |= 1 << (j * H1 + i)
+    return bits
+
+
+def bits_position(board, turn):
+    """
+    Returns the bitboard Position for the board, seen from `turn`.
+    """
+    other = Y if turn == R else R
+    current = stones(board, turn)
+    mask = current | stones(board, other)
+    return Position(current, mask, bin(mask).count("1"))
+
+
+def to_position(board):
+    """
+    Returns a bitboard Position for the board (a copy the caller may play on),
+    seen from the player to move.
+    """
+    if isinstance(board, Board):
+        return board.position.copy()
+    return bits_position(board, player(board))
 
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    to_compare = []
-    for i in range(3):
-        to_compare.append(board[i])
-        to_compare.append([board[j][i] for j in range(3)])
-    to_compare.append([board[0][0], board[1][1], board[2][2]])
-    to_compare.append([board[0][2], board[1][1], board[2][0]])
-    for row in to_compare:
-        if all(row[0] == k for k in row):
-            return row[0]
+    if isinstance(board, Board):
+        return board.winner()
+    for mark in (R, Y):
+        if alignment(stones(board, mark)):
+            return mark
     return None
 
 
@@ -90,13 +188,13 @@ def terminal(board):
     Returns True if game is over, False otherwise.
     """
     if winner(board):
-        # print("terminating board: w :", board)
         return True
+    if isinstance(board, Board):
+        return board.full()
     for i in board:
         for j in i:
             if j is None:
                 return False
-    # print("terminating board: nw :", board)
     return True
 
 
@@ -108,46 +206,39 @@ def utility(board):
     return util_dict[winner(board)]
 
 
-def minimax(board):
+def search(board, max_depth=w * h, max_nodes=100000, time_limit=None, use_book=True,
+           searcher=None, on_iteration=None):
     """
-    Returns the optimal action for the current player on the board.
+    Searches the board and returns a search.SearchResult with the best column,
+    its score for the current player, the depth reached and the nodes searched.
+    Positions in the opening book are answered from there (depth and nodes are 0),
+    the endgame tablebase is used during the search.
+    A `searcher` made by the caller (e.g. to cancel it) replaces the budget,
+    `on_iteration` is passed on to Searcher.search.
     """
-    to_play = player(board)
-    to_play = to_play == "R"
-    if to_play:
-        best = None
-        best_val = -1e10
-        for action in actions(board):
-            val = min_value(result(board, action))
-            if val > best_val:
-                best_val = val
-                best = action
-    else:
-        best = None
-        best_val = 1e10
-        for action in actions(board):
-            val = max_value(result(board, action))
-            if val < best_val:
-                best_val = val
-                best = action
-    return best
-
-
-def min_value(board):
-    if terminal(board):
-        return utility(board)
-    else:
-        v = +1e10
-        for action in actions(board):
-            v = min(max_value(result(board, action)), v)
-        return v
-
-def max_value(board):
-    if terminal(board):
-        return utility(board)
-    else:
-        v = -1e10
-        for action in actions(board):
-            v = max(min_value(result(board, action)), v)
-        return v
+    pos = to_position(board)
+    if use_book:
+        hit = default_book().probe(pos)
+        if hit is not None:
+            return SearchResult(hit[0], hit[1], 0, 0)
+    if searcher is None:
+        searcher = Searcher(max_depth, max_nodes, time_limit, tablebase=default_tablebase())
+    return searcher.search(pos, on_iteration)
+
 
+def column_action(board, col):
+    """
+    Returns the (i, j) action that drops a stone into column `col`.
+    """
+    return (as_board(board).heights[col], col)
+
+
+def minimax(board, **budget):
+    """
+    Returns the optimal action for the current player on the board.
+    `budget` is passed on to `search`.
+    """
+    col = search(board, **budget).move
+    if col is None:
+        return None
+    return column_action(board, col)
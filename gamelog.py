@@ -0,0 +1,129 @@
+"""
+Self-play game logs and offline training from them.
+
+A log is an append-only file of games. Each game is one record: a byte with
+the number of moves, then the columns played, two to a byte (4 bits each).
+Logs written with compress=True are gzip files; every writer session adds a
+gzip member, which still reads back as one stream.
+"""
+
+import gzip
+import random
+
+from cli import Game
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def pack(moves):
+    """one game record for the list of columns `moves`"""
+    out = bytearray([len(moves)])
+    for i in range(0, len(moves), 2):
+        hi = moves[i + 1] if i + 1 < len(moves) else 0
+        out.append(moves[i] | hi << 4)
+    return bytes(out)
+
+
+class GameLogWriter:
+    """appends games to the log at `path`, buffered"""
+    def __init__(self, path, compress=False, buffer_size=1 << 16):
+        self.path = path
+        if compress:
+            self.f = gzip.open(path, "ab")
+        else:
+            self.f = open(path, "ab", buffering=buffer_size)
+        self.games = 0
+
+    def write(self, moves):
+        self.f.write(pack(moves))
+        self.games += 1
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_games(path):
+    """yields the games of a log as lists of columns, one at a time"""
+    with open(path, "rb") as raw:
+        compressed = raw.read(2) == GZIP_MAGIC
+    f = gzip.open(path, "rb") if compressed else open(path, "rb", buffering=1 << 16)
+    with f:
+        while True:
+            head = f.read(1)
+            if not head:
+                return
+            n = head[0]
+            body = f.read((n + 1) // 2)
+            moves = []
+            for byte in body:
+                moves.append(byte & 15)
+                moves.append(byte >> 4)
+            yield moves[:n]
+
+
+def game_after(moves):
+    """a Game with `moves` played from the empty board"""
+    game = Game(player=0, targets="01")
+    for col in moves:
+        game.position.play(col)
+    game.player = len(moves) % 2
+    if game.player:
+        game.targets = "10"
+    return game
+
+
+def transitions(moves):
+    """
+    the (moves so far, action, reward) updates selfplay makes for a game:
+    every move gets reward 1 once it's played, and when a move ends the game
+    the move before it gets -1
+    """
+    game = game_after([])
+    for i, col in enumerate(moves):
+        ended = game.someoneWins(col, "0") or game.position.moves == Game.width * Game.height - 1
+        yield moves[:i], col, 1
+        if ended:
+            if i:
+                yield moves[:i - 1], moves[i - 1], -1
+            return
+        game.position.play(col)
+
+
+def replay(model, paths, shuffle=0, seed=0):
+    """
+    trains `model` (a cli.AI) on the games in the logs at `paths`, applying the
+    same updates as selfplay without playing anything.
+    With `shuffle` > 0 the transitions go through a buffer of that size and
+    are applied in random order (experience replay).
+    Returns the number of games read.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    rng = random.Random(seed)
+    buffer = []
+    games = 0
+
+    def apply(batch):
+        for prefix, action, reward in batch:
+            model.update(game_after(prefix), action, reward)
+
+    for path in paths:
+        for moves in read_games(path):
+            games += 1
+            if not shuffle:
+                apply(transitions(moves))
+                continue
+            buffer.extend(transitions(moves))
+            if len(buffer) >= shuffle:
+                rng.shuffle(buffer)
+                apply(buffer)
+                buffer = []
+    rng.shuffle(buffer)
+    apply(buffer)
+    return games
@@ -0,0 +1,281 @@
+"""
+Monte Carlo tree search (UCT) over bitboard positions.
+
+The tree is kept between moves: when the next position to search is the old
+root plus the moves played since, the matching subtree becomes the new root.
+With workers > 1 every worker process grows (and keeps) its own tree from the
+root (root parallelism) and their visit counts are added up before picking a move.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from bitboard import COLUMNS, Position
+from search import SearchResult
+
+
+class Node:
+    """
+    `wins` and `visits` count the playouts through this node, scored for
+    the player that made `move`. A draw counts half a win.
+    """
+    __slots__ = ("move", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, pos):
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried = moves_to_try(pos)
+        self.visits = 0
+        self.wins = 0.0
+
+    def child(self, move):
+        for c in self.children:
+            if c.move == move:
+                return c
+        return None
+
+    def select(self, c):
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda n: n.wins / n.visits + c * math.sqrt(log_visits / n.visits))
+
+
+def moves_to_try(pos):
+    """legal columns of `pos`, just the winning one if there is one, none once the game is over"""
+    if pos.has_won() or pos.full():
+        return []
+    wins = pos.winning_mask()
+    if wins:
+        return [c for c in pos.legal_columns() if wins & COLUMNS[c]][:1]
+    return pos.legal_columns()
+
+
+def playout(pos, rng):
+    """
+    plays random moves (taking a win when there is one) until the game ends.
+    Returns 1 if the player that moved last into `pos` wins, 0 if they lose
+    and 0.5 for a draw. `pos` is left as it was found.
+    """
+    played = 0
+    result = 0.5
+    while True:
+        if pos.has_won():
+            result = 1.0 if played % 2 == 0 else 0.0
+            break
+        if pos.full():
+            break
+        wins = pos.winning_mask()
+        cols = pos.legal_columns()
+        if wins:
+            col = next(c for c in cols if wins & COLUMNS[c])
+        else:
+            col = rng.choice(cols)
+        pos.play(col)
+        played += 1
+    for i in range(played):
+        pos.undo()
+    return result
+
+
+def grow(root, pos, rng, c, playouts=None, deadline=None, should_stop=None):
+    """runs playouts on the tree under `root` (which stands for `pos`), returns how many"""
+    done = 0
+    while (playouts is None or done < playouts) and not (should_stop and should_stop()):
+        if deadline is not None and done % 64 == 0 and time.perf_counter() > deadline:
+            break
+        node = root
+        depth = 0
+        # select
+        while not node.untried and node.children:
+            node = node.select(c)
+            pos.play(node.move)
+            depth += 1
+        # expand
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            pos.play(move)
+            depth += 1
+            child = Node(move, node, pos)
+            node.children.append(child)
+            node = child
+        # simulate, then back up the result flipping sides on the way
+        result = playout(pos, rng) if depth else 0.5
+        while node is not None:
+            node.visits += 1
+            node.wins += result
+            result = 1 - result
+            node = node.parent
+        for i in range(depth):
+            pos.undo()
+        done += 1
+    return done
+
+
+# this worker's own tree, kept from one job to the next like MCTS keeps its tree
+_tree = None
+
+
+def _root_worker(args):
+    """
+    grows this worker's tree for the position, returns (worker pid, playouts
+    run, {move: (visits, wins)} for the root's children, counting every
+    playout the tree has had since its root last changed)
+    """
+    global _tree
+    current, mask, moves, history, playouts, time_limit, c, seed = args
+    pos = Position(current, mask, moves)
+    pos.history = list(history)
+    if _tree is None:
+        _tree = MCTS(c=c)
+    _tree.rng.seed(seed)
+    _tree.reroot(pos)
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    done = grow(_tree.root, pos, _tree.rng, c, playouts, deadline)
+    return os.getpid(), done, {n.move: (n.visits, n.wins) for n in _tree.root.children}
+
+
+class MCTS:
+    """
+    UCT search with a playout budget (`playouts`) and/or a time budget in seconds
+    (`time_limit`), keeping the tree between searches.
+    It can stand in for cli.AI in play() and for search.Searcher in runner.py.
+    """
+    def __init__(self, playouts=None, time_limit=1.0, c=1.4, workers=1, seed=None):
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.c = c
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.root = None
+        # (current, mask, moves) of the position the root stands for
+        self.root_pos = None
+        self.nodes = 0
+        self.cancelled = False
+        self.pool = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def reroot(self, pos):
+        """makes the root stand for `pos`, reusing the old tree when `pos` follows from it:
+        when playing the last moves of pos.history on the old root's position gets to `pos`"""
+        if self.root is not None:
+            current, mask, moves = self.root_pos
+            played = pos.history[len(pos.history) - (pos.moves - moves):]
+            if 0 <= pos.moves - moves == len(played):
+                walk = Position(current, mask, moves)
+                node = self.root
+                for move in played:
+                    node = node.child(move)
+                    if node is None:
+                        break
+                    walk.play(move)
+                if node is not None and walk.current == pos.current and walk.mask == pos.mask:
+                    node.parent = None
+                    self.root = node
+                    self.root_pos = (pos.current, pos.mask, pos.moves)
+                    return
+        self.root = Node(None, None, pos)
+        self.root_pos = (pos.current, pos.mask, pos.moves)
+
+    def search(self, pos, on_iteration=None):
+        """searches `pos` (left as it was found) and returns a search.SearchResult;
+        score is the win rate of the move for the player to move"""
+        self.cancelled = False
+        self.nodes = 0
+        self.reroot(pos)
+        root = self.root
+        if not root.untried and not root.children:
+            return SearchResult(None, 0, 0, 0)
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        step = 1000 if self.playouts is None else min(1000, self.playouts)
+
+        if self.workers > 1:
+            self.parallel(pos, step, deadline, on_iteration)
+        else:
+            work = pos.copy()
+            while not self.cancelled:
+                todo = step if self.playouts is None else min(step, self.playouts - self.nodes)
+                done = grow(root, work, self.rng, self.c, todo, deadline, lambda: self.cancelled)
+                self.nodes += done
+                if on_iteration is not None:
+                    on_iteration(self.best())
+                if done < todo or (self.playouts is not None and self.nodes >= self.playouts):
+                    break
+        return self.best()
+
+    def parallel(self, pos, step, deadline, on_iteration):
+        """
+        root parallel search in rounds of `step` playouts a worker. Every worker
+        keeps its own tree between rounds and moves, the root's children here
+        get the sum of the workers' counts
+        """
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers)
+        root = self.root
+        trees = {}
+        while not self.cancelled:
+            todo = step if self.playouts is None else min(step, -(-(self.playouts - self.nodes) // self.workers))
+            time_left = None if deadline is None else deadline - time.perf_counter()
+            if time_left is not None and time_left <= 0:
+                break
+            jobs = [(pos.current, pos.mask, pos.moves, pos.history, todo, time_left, self.c, self.rng.getrandbits(64))
+                    for i in range(self.workers)]
+            done = 0
+            for pid, played, counts in self.pool.map(_root_worker, jobs, 1):
+                # a worker that got two jobs has both in its last answer
+                trees[pid] = counts
+                done += played
+            self.nodes += done
+
+            root.children = []
+            root.untried = moves_to_try(pos)
+            root.visits = 0
+            root.wins = 0.0
+            for counts in trees.values():
+                for move, (visits, wins) in sorted(counts.items()):
+                    node = root.child(move)
+                    if node is None:
+                        pos.play(move)
+                        node = Node(move, root, pos)
+                        pos.undo()
+                        root.children.append(node)
+                        root.untried.remove(move)
+                    node.visits += visits
+                    node.wins += wins
+                    root.visits += visits
+                    root.wins += visits - wins
+            if on_iteration is not None:
+                on_iteration(self.best())
+            if done < todo * self.workers or (self.playouts is not None and self.nodes >= self.playouts):
+                break
+
+    def best(self):
+        """the most visited move at the root so far, as a SearchResult"""
+        root = self.root
+        if not root.children:
+            return SearchResult(root.untried[0] if root.untried else None, 0, 0, self.nodes)
+        node = max(root.children, key=lambda n: n.visits)
+        depth = 0
+        walk = node
+        while walk.children:
+            walk = max(walk.children, key=lambda n: n.visits)
+            depth += 1
+        return SearchResult(node.move, node.wins / node.visits, depth + 1, self.nodes)
+
+    def choose_action(self, state, train=False, time_limit=None):
+        """cli.AI compatible: picks a move for the cli.Game `state`"""
+        if time_limit is not None:
+            self.time_limit = time_limit
+        move = self.search(state.position).move
+        actions = state.actions()
+        return move if move in actions else actions[0]
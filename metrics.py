@@ -0,0 +1,151 @@
+"""
+Opt-in metrics and profiling.
+
+Counters are plain numbers bumped once per game or so (games, plies).
+Spans time the hot functions: enable() wraps them (Game.actions,
+Game.makeMove, Game.someoneWins, AI.getBestFuture, connect4.minimax) to count
+calls and add up the time spent in them, disable() puts the originals back,
+so with metrics off they cost nothing at all. A recursive function is only
+timed at its outermost call.
+
+Reporter writes all of it, with rates, as a json line every few seconds;
+profile() runs cProfile and dumps pstats, which snakeviz, gprof2dot or
+flameprof turn into call graphs and flame graphs.
+"""
+
+import contextlib
+import functools
+import importlib
+import time
+
+# (module, class or None for a module function, function), timed as "Class.function"
+HOT = [
+    ("cli", "Game", "actions"),
+    ("cli", "Game", "makeMove"),
+    ("cli", "Game", "someoneWins"),
+    ("cli", "AI", "getBestFuture"),
+    ("connect4", None, "minimax"),
+]
+
+counters = {}
+# name -> [calls, seconds]
+spans = {}
+# (owner, name, original) for everything enable() wrapped
+_wrapped = []
+
+
+def count(name, n=1):
+    counters[name] = counters.get(name, 0) + n
+
+
+def timed(name, fn):
+    """`fn` counting its calls and timing them into spans[name]"""
+    span = spans.setdefault(name, [0, 0.0])
+    active = [0]
+    clock = time.perf_counter
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        span[0] += 1
+        if active[0]:
+            return fn(*args, **kwargs)
+        active[0] = 1
+        start = clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            span[1] += clock() - start
+            active[0] = 0
+    return wrapper
+
+
+def enabled():
+    return bool(_wrapped)
+
+
+def enable(hot=HOT):
+    """wraps the functions in `hot` with spans"""
+    if _wrapped:
+        return
+    for module, cls, attr in hot:
+        owner = importlib.import_module(module)
+        if cls is not None:
+            owner = getattr(owner, cls)
+        original = owner.__dict__[attr]
+        setattr(owner, attr, timed(f"{cls}.{attr}" if cls else f"{module}.{attr}", original))
+        _wrapped.append((owner, attr, original))
+
+
+def disable():
+    while _wrapped:
+        owner, attr, original = _wrapped.pop()
+        setattr(owner, attr, original)
+
+
+def reset():
+    counters.clear()
+    for span in spans.values():
+        span[0] = 0
+        span[1] = 0.0
+
+
+def snapshot():
+    return {
+        "counters": dict(counters),
+        "spans": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in spans.items()},
+    }
+
+
+class Reporter:
+    """
+    appends a json line to `path` at most every `every` seconds, from tick(),
+    and a last one from close(). With a cli.AI `model` the lines also carry its
+    search nodes and Q-table size
+    """
+    def __init__(self, path, every=10.0, model=None):
+        self.path = path
+        self.every = every
+        self.model = model
+        self.f = open(path, "a")
+        self.start = self.last = time.perf_counter()
+        self.last_counters = dict(counters)
+
+    def tick(self):
+        if time.perf_counter() - self.last >= self.every:
+            self.write()
+
+    def write(self):
+        import json
+
+        now = time.perf_counter()
+        report = snapshot()
+        report["time"] = time.time()
+        report["elapsed"] = now - self.start
+        report["rates"] = {f"{name}_per_sec": (n - self.last_counters.get(name, 0)) / max(now - self.last, 1e-9)
+                           for name, n in counters.items()}
+        if self.model is not None:
+            report["nodes"] = self.model.nodes
+            if self.model.q is not None:
+                report["q_size"] = len(self.model.q)
+        self.f.write(json.dumps(report) + "\n")
+        self.f.flush()
+        self.last = now
+        self.last_counters = dict(counters)
+
+    def close(self):
+        self.write()
+        self.f.close()
+
+
+@contextlib.contextmanager
+def profile(path):
+    """runs the block under cProfile and dumps the stats to `path`"""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
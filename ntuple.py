@@ -0,0 +1,140 @@
+"""
+N-tuple network value function for cli.AI.
+
+Instead of one Q value per (position, action) ever seen, the value of a move
+is worked out from the position it leads to: a fixed set of tuples, each a
+handful of board cells, read the cells (empty, the mover's or the
+opponent's) as a base 3 number, which picks one weight out of that tuple's
+lookup table. The value is the sum over all the tuples, and over their
+mirror images, which share the weights. Memory is fixed when the network is
+made, count * 3**length float32s (70 tuples of 8 cells is 1.8MB), and
+positions never seen before still get a value from the patterns they share
+with positions that were.
+"""
+
+import numpy as np
+
+import cli
+from bitboard import WIDTH, HEIGHT, H1, bottom_mask, column_mask
+
+CELLS = WIDTH * H1  # bit positions, the extra bit on top of each column is never set
+STEPS = [(dc, dr) for dc in (-1, 0, 1) for dr in (-1, 0, 1) if dc or dr]
+
+
+def random_tuples(count=70, length=8, seed=0):
+    """`count` tuples of `length` cells, each a random walk over neighbouring cells"""
+    rng = np.random.default_rng(seed)
+    tuples = []
+    while len(tuples) < count:
+        c, r = int(rng.integers(WIDTH)), int(rng.integers(HEIGHT))
+        cells = [(c, r)]
+        for i in range(100 * length):
+            if len(cells) == length:
+                break
+            dc, dr = STEPS[rng.integers(len(STEPS))]
+            c2, r2 = c + dc, r + dr
+            if 0 <= c2 < WIDTH and 0 <= r2 < HEIGHT:
+                c, r = c2, r2
+                if (c, r) not in cells:
+                    cells.append((c, r))
+        if len(cells) == length:
+            tuples.append([c * H1 + r for c, r in cells])
+    return np.array(tuples, dtype=np.intp)
+
+
+def mirrored(tuples):
+    """the same tuples on the board flipped left to right"""
+    col, row = np.divmod(tuples, H1)
+    return (WIDTH - 1 - col) * H1 + row
+
+
+def cell_states(mine, theirs):
+    """array of CELLS entries: 0 empty, 1 in `mine`, 2 in `theirs` (two bitboards)"""
+    def bits(x):
+        return np.unpackbits(np.frombuffer(x.to_bytes(8, "little"), np.uint8), bitorder="little")[:CELLS]
+    return bits(mine) + 2 * bits(theirs)
+
+
+class NTupleNetwork:
+    """the tuples and their weights; values are for the player that made the last move"""
+    def __init__(self, tuples=None, weights=None):
+        self.tuples = random_tuples() if tuples is None else np.asarray(tuples, dtype=np.intp)
+        count, length = self.tuples.shape
+        self.features = np.concatenate([self.tuples, mirrored(self.tuples)])
+        self.powers = 3 ** np.arange(length)
+        self.offsets = np.tile(np.arange(count) * 3 ** length, 2)
+        if weights is None:
+            weights = np.zeros(count * 3 ** length, dtype=np.float32)
+        self.weights = weights
+
+    @property
+    def nbytes(self):
+        return self.weights.nbytes
+
+    def indices(self, states):
+        """weight indices of every tuple for a (n, CELLS) array of cell states, shape (n, 2 * count)"""
+        return (states[:, self.features] * self.powers).sum(axis=2) + self.offsets
+
+    def values(self, states):
+        return self.weights[self.indices(states)].sum(axis=1)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, tuples=self.tuples, weights=self.weights)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["tuples"], data["weights"])
+
+
+class NTupleAI(cli.AI):
+    """
+    cli.AI with an NTupleNetwork in place of the Q dict: Q(state, action) is the
+    network's value of the position after `action`, and update_q_val moves it
+    by the same TD rule, spread over the weights that make it up.
+    Everything else (search, book, tablebase, training) is the AI's own.
+    checkpoint.py and train_parallel only know Q values, they can't be used with this
+    """
+    def __init__(self, network=None, **kwargs):
+        super().__init__(**kwargs)
+        self.q = None
+        self.network = NTupleNetwork() if network is None else network
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        return cls(NTupleNetwork.load(path), **kwargs)
+
+    def save(self, path, js_out=None):
+        self.network.save(path)
+
+    def afterstates(self, state: cli.Game, actions):
+        """cell states after each of `actions`, seen from the player making it"""
+        pos = state.position
+        base = cell_states(pos.current, pos.opponent())
+        states = np.repeat(base[None, :], len(actions), axis=0)
+        for i, action in enumerate(actions):
+            cell = ((pos.mask + bottom_mask(action)) & column_mask(action)).bit_length() - 1
+            states[i, cell] = 1
+        return states
+
+    def q_vals(self, state: cli.Game, actions):
+        if not len(actions):
+            return []
+        return self.network.values(self.afterstates(state, actions)).tolist()
+
+    def get_q_val(self, state: cli.Game, action, key=None):
+        return self.q_vals(state, [action])[0]
+
+    def update_q_val(self, state: cli.Game, action, reward, best_future, old_val):
+        if best_future == 0 and reward == 0:
+            return
+        target = old_val + self.alpha * (reward + best_future - old_val)
+        net = self.network
+        idx = net.indices(self.afterstates(state, [action]))[0]
+        change = target - net.weights[idx].sum()
+        # a weight can be picked by more than one tuple (a tuple and its mirror
+        # image on a symmetric board), spread the change so the sum moves by `change`
+        idx, counts = np.unique(idx, return_counts=True)
+        net.weights[idx] += change * counts / (counts * counts).sum()
+        self.generation += 1
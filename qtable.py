@@ -0,0 +1,82 @@
+"""
+Binary Q-table files.
+
+Layout (little endian):
+    header   8s magic, I version, I value size (0 or 4: float32, 8: float64), Q count
+    keys     count * uint64, sorted
+    values   count * float32 (or float64), in the same order as the keys
+The keys are the ints from cli.AI.key, so a lookup is a binary search over the
+key array. QTableFile maps the file with mmap and reads straight out of the
+mapping, so opening is instant whatever the size and processes that open the
+same file share its pages.
+"""
+
+import bisect
+import mmap
+import struct
+from array import array
+
+MAGIC = b"C4QTABLE"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+
+
+def write_qtable(path, q, exact=False):
+    """writes the dict `q` (int key -> value) to `path` in one pass.
+    Values are stored as float32, or as float64 (exactly) with `exact`"""
+    keys = array("Q", sorted(q))
+    values = array("d" if exact else "f", [q[k] for k in keys])
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, values.itemsize, len(keys)))
+        keys.tofile(f)
+        values.tofile(f)
+
+
+def export_json(path, q):
+    """human readable dump of `q`, for debugging only"""
+    import json  # not needed otherwise, and slow to import
+
+    with open(path, "w") as f:
+        json.dump({str(k): q[k] for k in sorted(q)}, f, indent=2)
+
+
+class QTableFile:
+    """read-only, memory-mapped view of a file written by write_qtable"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION or size not in (0, 4, 8):
+            self.mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} Q-table file")
+        self.count = count
+        start = HEADER.size
+        view = memoryview(self.mm)
+        keys = view[start:start + 8 * count]
+        size = size or 4
+        values = view[start + 8 * count:start + (8 + size) * count]
+        self.keys = keys.cast("Q")
+        self.values = values.cast("d" if size == 8 else "f")
+        # every view has to be released before the mapping can be closed
+        self.views = [self.keys, self.values, keys, values, view]
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        i = bisect.bisect_left(self.keys, key)
+        if i < self.count and self.keys[i] == key:
+            return self.values[i]
+        return default
+
+    def items(self):
+        return zip(self.keys, self.values)
+
+    def close(self):
+        for view in self.views:
+            view.release()
+        self.mm.close()
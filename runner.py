@@ -1,8 +1,13 @@
 import pygame
 import sys
-import time
+import threading
 
 import connect4 as c4
+import server
+from cache import LRUCache
+from mcts import MCTS
+from search import Searcher
+from tablebase import default_tablebase
 
 pygame.init()
 size = width, height = 800, 700
@@ -19,134 +24,253 @@ mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
 moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
-user = None
-board = c4.initial_state()
-ai_turn = False
+# frames per second at most, while the computer is thinking. The rest of the
+# time nothing moves, so the loop sleeps until there's a click to handle
+fps = 30
+clock = pygame.time.Clock()
+SEARCH_DONE = pygame.USEREVENT
+# only these wake the loop up; when the window is uncovered everything is drawn again
+EXPOSED = (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE)
+pygame.event.set_blocked(None)
+pygame.event.set_allowed([pygame.QUIT, pygame.MOUSEBUTTONDOWN, SEARCH_DONE, *EXPOSED])
 
-while True:
+# search budget for one computer move
+ai_nodes = 200000
+ai_time = 2.0
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            sys.exit()
+# the computer plays with minimax, or with MCTS which keeps its tree between moves,
+# or asks a running server.py, which has its caches warm already
+engines = ["minimax", "mcts"]
+mcts = MCTS(time_limit=ai_time)
+remote = None
+if server.available():
+    engines.append("server")
+
+
+def make_searcher(engine):
+    global remote
+    if engine == "mcts":
+        return mcts
+    if engine == "server":
+        if remote is None:
+            remote = server.Client()
+        return remote
+    return Searcher(max_nodes=ai_nodes, tablebase=default_tablebase())
+
+
+class Thinker(threading.Thread):
+    """
+    Searches for the computer's move on a worker thread so the window keeps
+    responding. `depth` and `nodes` show how far it got, `result` is the
+    search.SearchResult once it's done, cancel() stops it early.
+    """
+    def __init__(self, board, searcher):
+        super().__init__(daemon=True)
+        self.board = board
+        self.searcher = searcher
+        self.depth = 0
+        self.result = None
+
+    @property
+    def nodes(self):
+        return self.searcher.nodes
+
+    def progress(self, result):
+        self.depth = result.depth
+
+    def run(self):
+        try:
+            result = c4.search(self.board, searcher=self.searcher, on_iteration=self.progress)
+        except (OSError, ValueError):
+            # the server went away or couldn't answer, think here instead,
+            # and connect again for the next move
+            global remote
+            if self.searcher is remote:
+                remote.close()
+                remote = None
+            self.searcher = make_searcher("minimax")
+            result = c4.search(self.board, searcher=self.searcher, on_iteration=self.progress)
+        if not self.searcher.cancelled:
+            self.result = result
+        # wakes the main loop up
+        pygame.event.post(pygame.event.Event(SEARCH_DONE))
+
+    def cancel(self):
+        self.searcher.cancel()
+
+
+# Everything on screen is drawn once and then again only where it changed:
+# labels are rendered once, the layout below never moves, and only the
+# rectangles drawn over in a frame are sent to the display. The titles with
+# the search's progress change every frame, so only the last few rendered
+# strings are kept.
+_text = LRUCache(32)
 
+
+def text(font, string, colour):
+    """`string` rendered in `font`, from the cache if it was rendered lately"""
+    key = (font, string, colour)
+    surface = _text.get(key)
+    if surface is None:
+        surface = font.render(string, True, colour)
+        _text.put(key, surface)
+    return surface
+
+
+def blit_centred(surface, centre):
+    rect = surface.get_rect(center=centre)
+    screen.blit(surface, rect)
+    return rect
+
+
+def draw_button(rect, label, colour):
+    pygame.draw.rect(screen, white, rect)
+    blit_centred(text(mediumFont, label, colour), rect.center)
+    return rect
+
+
+playRButton = pygame.Rect((width / 8), (height / 2), width / 4, 50)
+playYButton = pygame.Rect(5 * (width / 8), (height / 2), width / 4, 50)
+engineButton = pygame.Rect(3 * (width / 8), (height / 2) + 100, width / 4, 50)
+againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
+titleArea = pygame.Rect(0, 0, width, 60)
+
+tile_size = 80
+tile_origin = (width / 3.5 - (1.5 * tile_size),
+               height / 3 - (1.5 * tile_size))
+tiles = [[pygame.Rect(tile_origin[0] + j * tile_size, tile_origin[1] + i * tile_size, tile_size, tile_size)
+          for j in range(7)] for i in range(6)]
+
+
+def draw_menu():
     screen.fill(black)
+    blit_centred(text(largeFont, "Play Connect 4", white), ((width / 2), 50))
+    draw_button(playRButton, "Play as Red", red)
+    draw_button(playYButton, "Play as Yellow", yellow)
+    draw_button(engineButton, f"AI: {engine}", black)
+    return screen.get_rect()
 
-    # Let user choose a player.
-    if user is None:
 
-        # Draw title
-        title = largeFont.render("Play Connect 4", True, white)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 50)
-        screen.blit(title, titleRect)
-
-        # Draw buttons
-        playRButton = pygame.Rect((width / 8), (height / 2), width / 4, 50)
-        playR = mediumFont.render("Play as Red", True, red)
-        playRRect = playR.get_rect()
-        playRRect.center = playRButton.center
-        pygame.draw.rect(screen, white, playRButton)
-        screen.blit(playR, playRRect)
-
-        playYButton = pygame.Rect(5 * (width / 8), (height / 2), width / 4, 50)
-        playY = mediumFont.render("Play as Yellow", True, yellow)
-        playYRect = playY.get_rect()
-        playYRect.center = playYButton.center
-        pygame.draw.rect(screen, white, playYButton)
-        screen.blit(playY, playYRect)
-
-        # Check if button is clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if playRButton.collidepoint(mouse):
-                time.sleep(0.2)
-                user = c4.R
-            elif playYButton.collidepoint(mouse):
-                time.sleep(0.2)
-                user = c4.Y
+def draw_tile(i, j):
+    rect = tiles[i][j]
+    screen.fill(black, rect)
+    pygame.draw.rect(screen, white, rect, 7)
+    if board[i][j] != c4.EMPTY:
+        blit_centred(text(moveFont, board[i][j], white), rect.center)
+    return rect
 
-    else:
 
-        # Draw game board
-        tile_size = 80
-        tile_origin = (width / 3.5 - (1.5 * tile_size),
-                       height / 3 - (1.5 * tile_size))
-        tiles = []
+def draw_title(title):
+    screen.fill(black, titleArea)
+    blit_centred(text(largeFont, title, white), titleArea.center)
+    return titleArea
+
+
+def game_title():
+    if c4.terminal(board):
+        winner = c4.winner(board)
+        if winner is None:
+            return f"Game Over: Tie."
+        return f"Game Over: {winner} wins."
+    if user == c4.player(board):
+        return f"Play as {user}"
+    if thinker is not None and thinker.depth:
+        return f"Computer thinking... depth {thinker.depth}, {thinker.nodes} nodes"
+    return f"Computer thinking..."
+
+
+user = None
+board = c4.initial_state()
+thinker = None
+engine = engines[0]
+
+# what's on the screen now: the menu (and its engine) or the game (board, title, button)
+shown = None
+shown_board = None
+shown_title = None
+shown_again = False
+
+while True:
+
+    # Check for AI move, the search runs in the background
+    if user is not None and user != c4.player(board) and not c4.terminal(board):
+        if thinker is None:
+            thinker = Thinker(board, make_searcher(engine))
+            thinker.start()
+        elif thinker.result is not None:
+            board = c4.result(board, c4.column_action(board, thinker.result.move))
+            thinker = None
+
+    # Draw what changed
+    dirty = []
+    if user is None:
+        if shown != ("menu", engine):
+            shown = ("menu", engine)
+            dirty.append(draw_menu())
+    else:
+        if shown != "game":
+            shown = "game"
+            screen.fill(black)
+            dirty.append(screen.get_rect())
+            shown_board = shown_title = None
+            shown_again = False
         for i in range(6):
-            row = []
             for j in range(7):
-                rect = pygame.Rect(
-                    tile_origin[0] + j * tile_size,
-                    tile_origin[1] + i * tile_size,
-                    tile_size, tile_size
-                )
-                pygame.draw.rect(screen, white, rect, 7)
-
-                if board[i][j] != c4.EMPTY:
-                    move = moveFont.render(board[i][j], True, white)
-                    moveRect = move.get_rect()
-                    moveRect.center = rect.center
-                    screen.blit(move, moveRect)
-                row.append(rect)
-            tiles.append(row)
-
+                if shown_board is None or shown_board[i][j] != board[i][j]:
+                    dirty.append(draw_tile(i, j))
+        shown_board = [list(row) for row in board]
+        title = game_title()
+        if title != shown_title:
+            shown_title = title
+            dirty.append(draw_title(title))
         game_over = c4.terminal(board)
-        player = c4.player(board)
-
-        # Show title
-        if game_over:
-            winner = c4.winner(board)
-            if winner is None:
-                title = f"Game Over: Tie."
-            else:
-                title = f"Game Over: {winner} wins."
-        elif user == player:
-            title = f"Play as {user}"
-        else:
-            title = f"Computer thinking..."
-        title = largeFont.render(title, True, white)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 30)
-        screen.blit(title, titleRect)
-
-        # Check for AI move
-        if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = c4.minimax(board)
-                board = c4.result(board, move)
-                ai_turn = False
+        if game_over != shown_again:
+            shown_again = game_over
+            if game_over:
+                dirty.append(draw_button(againButton, "Play Again", black))
             else:
-                ai_turn = True
+                screen.fill(black, againButton)
+                dirty.append(againButton)
+    if dirty:
+        pygame.display.update(dirty)
+
+    # Wait for something to happen: a frame at most while the computer thinks
+    # (its progress is in the title), else as long as it takes
+    thinking = thinker is not None and thinker.result is None
+    clock.tick(fps)
+    events = [pygame.event.wait(1000 // fps if thinking else 0)] + pygame.event.get()
+
+    for event in events:
+        if event.type == pygame.QUIT:
+            if thinker is not None:
+                thinker.cancel()
+            sys.exit()
+        if event.type in EXPOSED:
+            shown = None
+            continue
+        if event.type != pygame.MOUSEBUTTONDOWN or event.button != 1:
+            continue
+        mouse = event.pos
+
+        # Let user choose a player.
+        if user is None:
+            if playRButton.collidepoint(mouse):
+                user = c4.R
+            elif playYButton.collidepoint(mouse):
+                user = c4.Y
+            elif engineButton.collidepoint(mouse):
+                engine = engines[(engines.index(engine) + 1) % len(engines)]
 
         # Check for a user move
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1 and user == player and not game_over:
-            mouse = pygame.mouse.get_pos()
+        elif user == c4.player(board) and not c4.terminal(board):
             for i in range(6):
                 for j in range(7):
-                    if (board[i][j] == c4.EMPTY and tiles[i][j].collidepoint(mouse)):
-                        print("board before move:", board)
-                        print("board after move:", c4.result(board, (i, j)))
+                    if ((i, j) in c4.actions(board) and tiles[i][j].collidepoint(mouse)):
                         board = c4.result(board, (i, j))
-                        print("board before move:", board)
-                        exit()
-
-        if game_over:
-            againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
-            again = mediumFont.render("Play Again", True, black)
-            againRect = again.get_rect()
-            againRect.center = againButton.center
-            pygame.draw.rect(screen, white, againButton)
-            screen.blit(again, againRect)
-            click, _, _ = pygame.mouse.get_pressed()
-            if click == 1:
-                mouse = pygame.mouse.get_pos()
-                if againButton.collidepoint(mouse):
-                    time.sleep(0.2)
-                    user = None
-                    board = c4.initial_state()
-                    ai_turn = False
-
-    pygame.display.flip()
+
+        elif c4.terminal(board) and againButton.collidepoint(mouse):
+            if thinker is not None:
+                thinker.cancel()
+            user = None
+            board = c4.initial_state()
+            thinker = None
@@ -0,0 +1,250 @@
+"""
+Alpha-beta search over bitboard positions.
+
+Negamax with a transposition table, iterative deepening and centre-first move
+ordering. Scores are always from the point of view of the player to move:
+    WIN + n   the player to move wins, n is bigger the sooner the win comes
+    -WIN - n  the player to move loses
+    anything in between is a heuristic guess at the search horizon (0 for a draw)
+"""
+
+import time
+from collections import namedtuple
+
+from bitboard import SIZE, CENTRE_ORDER, CELL_WEIGHT, COLUMNS, winning_cells
+
+WIN = 1000
+INF = 10 * WIN
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+SearchResult = namedtuple("SearchResult", "move score depth nodes")
+
+
+def popcount(x):
+    return bin(x).count("1")
+
+
+def win_score(pos):
+    """score of a position where the player to move can win right away"""
+    return WIN + (SIZE + 1 - pos.moves) // 2
+
+
+def loss_score(pos):
+    """score of a position where the opponent wins on their next move"""
+    return -WIN - (SIZE - pos.moves) // 2
+
+
+def is_solved(score):
+    return abs(score) >= WIN
+
+
+class TranspositionTable:
+    """
+    Fixed size, always-replace hash table. Every slot holds
+    (key, depth, flag, score, move), keys are checked in full on a probe.
+    """
+    def __init__(self, size=1 << 20):
+        self.size = size
+        self.slots = [None] * size
+
+    def get(self, key):
+        entry = self.slots[key % self.size]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def put(self, key, depth, flag, score, move):
+        self.slots[key % self.size] = (key, depth, flag, score, move)
+
+    def clear(self):
+        self.slots = [None] * self.size
+
+
+class OutOfBudget(Exception):
+    pass
+
+
+class Searcher:
+    """
+    Iterative deepening negamax.
+    The search stops at `max_depth`, or once `max_nodes` or `time_limit` (seconds)
+    is used up, in which case the last fully searched depth is returned.
+    Pass the same `tt` to several searchers to share what they have learnt.
+    cancel() can be called from another thread to stop a running search.
+    With a `tablebase` (tablebase.Tablebase) endgame positions are looked up
+    instead of searched.
+    """
+    def __init__(self, max_depth=SIZE, max_nodes=None, time_limit=None, tt=None, tablebase=None):
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.tablebase = tablebase
+        self.tablebase_from = tablebase.first_move() if tablebase is not None else SIZE + 1
+        self.nodes = 0
+        self.deadline = None
+        self.abortable = False
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def search(self, pos, on_iteration=None):
+        """
+        searches `pos` (left as it was found) and returns a SearchResult.
+        `on_iteration` is called with the result of every finished depth.
+        """
+        self.nodes = 0
+        self.deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        # always finish depth 1 so there is a move to return
+        self.abortable = False
+        best = None
+        ply = len(pos.history)
+        for depth in range(1, min(self.max_depth, SIZE - pos.moves) + 1):
+            try:
+                score, move = self.root(pos, depth)
+            except OutOfBudget:
+                while len(pos.history) > ply:
+                    pos.undo()
+                break
+            best = SearchResult(move, score, depth, self.nodes)
+            if on_iteration is not None:
+                on_iteration(best)
+            self.abortable = True
+            if is_solved(score) or self.cancelled:
+                break
+        if best is None:
+            return SearchResult(None, 0, 0, self.nodes)
+        return best._replace(nodes=self.nodes)
+
+    def root(self, pos, depth):
+        legal = pos.legal_columns()
+        wins = pos.winning_mask()
+        if wins:
+            move = next(c for c in legal if wins & COLUMNS[c])
+            self.nodes += 1
+            return win_score(pos), move
+
+        alpha, beta = -INF, INF
+        best_move = None
+        entry = self.tt.get(pos.key())
+        first = entry[4] if entry is not None else None
+        for col in self.order(pos, self.candidates(pos) or pos.legal_mask(), first):
+            pos.play(col)
+            score = -self.negamax(pos, depth - 1, -beta, -alpha)
+            pos.undo()
+            if best_move is None or score > alpha:
+                alpha = score
+                best_move = col
+        self.tt.put(pos.key(), depth, EXACT, alpha, best_move)
+        return alpha, best_move
+
+    def candidates(self, pos):
+        """
+        bitmap of the moves worth searching: a forced block if the opponent
+        threatens to win, never the cell right below an opponent's winning cell
+        """
+        legal = pos.legal_mask()
+        threats = winning_cells(pos.opponent(), pos.mask)
+        forced = legal & threats
+        if forced:
+            if forced & (forced - 1):
+                return 0  # two threats, can't block both
+            legal = forced
+        return legal & ~(threats >> 1)
+
+    def order(self, pos, moves, first=None, threats=True):
+        """
+        columns with a playable cell in `moves`: `first`, then the moves that
+        leave the most winning cells behind, then by how many lines go through
+        the cell, then centre first
+        """
+        if threats:
+            scored = []
+            current, mask = pos.current, pos.mask
+            for i, c in enumerate(CENTRE_ORDER):
+                move = moves & COLUMNS[c]
+                if move:
+                    made = popcount(winning_cells(current | move, mask | move))
+                    scored.append((-made, -CELL_WEIGHT[move.bit_length() - 1], i, c))
+            scored.sort()
+            cols = [s[3] for s in scored]
+        else:
+            cols = [c for c in CENTRE_ORDER if moves & COLUMNS[c]]
+        if first is not None and first in cols:
+            cols.remove(first)
+            cols.insert(0, first)
+        return cols
+
+    def evaluate(self, pos):
+        """horizon guess: how many more open winning cells the player to move has"""
+        return (popcount(winning_cells(pos.current, pos.mask))
+                - popcount(winning_cells(pos.opponent(), pos.mask)))
+
+    def negamax(self, pos, depth, alpha, beta):
+        self.nodes += 1
+        if self.cancelled or self.abortable and (
+                (self.max_nodes is not None and self.nodes > self.max_nodes)
+                or (self.deadline is not None and not self.nodes & 1023
+                    and time.perf_counter() > self.deadline)):
+            raise OutOfBudget()
+
+        if pos.winning_mask():
+            return win_score(pos)
+        if pos.moves >= SIZE - 1:
+            return 0  # the last stone can't win any more, it's a draw
+        if pos.moves >= self.tablebase_from:
+            score = self.tablebase.probe(pos)
+            if score is not None:
+                return score
+        moves = self.candidates(pos)
+        if not moves:
+            return loss_score(pos)
+        if depth <= 0:
+            return self.evaluate(pos)
+
+        key = pos.key()
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            _, e_depth, flag, score, tt_move = entry
+            if e_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score > alpha:
+                    alpha = score
+                elif flag == UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    return score
+
+        alpha_orig = alpha
+        best = -INF
+        best_move = None
+        # scoring the moves doesn't pay off right above the horizon
+        for col in self.order(pos, moves, tt_move, depth > 1):
+            pos.play(col)
+            score = -self.negamax(pos, depth - 1, -beta, -alpha)
+            pos.undo()
+            if score > best:
+                best = score
+                best_move = col
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.put(key, depth, flag, best, best_move)
+        return best
+
+
+def best_move(pos, **budget):
+    """shortcut for Searcher(**budget).search(pos)"""
+    return Searcher(**budget).search(pos)
@@ -0,0 +1,282 @@
+"""
+Local analysis server.
+
+    python server.py --port 7777 --workers 4 --nodes 100000
+
+Answers "best move for this position" over a localhost socket, one json
+object a line each way:
+    {"id": 1, "position": "4453"}          -> {"id": 1, "move": 3, "score": ..., ...}
+    {"op": "stats"}                        -> request, batch and cache counts
+Positions are written as for analyze.py. Requests from all connections are
+collected for a few milliseconds into a batch, repeats are answered once,
+and the rest is split over a process pool whose workers keep their engine
+(book, tablebase, transposition table or Q-table) from one request to the next.
+Answers are also kept in an LRU cache.
+
+Client talks to it, and can stand in for cli.AI in cli.play() and for the
+searchers in runner.py.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import analyze
+from cache import LRUCache
+from search import SearchResult
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+# seconds a Client waits for an answer before giving up
+DEFAULT_TIMEOUT = 60.0
+
+
+def _analyse_batch(items):
+    """runs in a worker: results for a list of (position key, text), keyed in place of the line number"""
+    return [analyze._analyse(item) for item in items]
+
+
+class Server:
+    """
+    `options` pick the engine (see analyze.make_analyser). A batch is sent off
+    once it has `batch_size` requests or the first one has waited `batch_wait` seconds
+    """
+    def __init__(self, host=HOST, port=DEFAULT_PORT, workers=None, batch_size=64, batch_wait=0.002,
+                 cache_size=100000, **options):
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(self.workers, initializer=analyze._init_worker, initargs=(options,))
+        self.cache = LRUCache(cache_size)
+        self.queue = None
+        self.requests = 0
+        self.batches = 0
+        self.batched = 0
+
+    async def analyse(self, text):
+        """the result for one position, through the batcher"""
+        self.requests += 1
+        try:
+            key = analyze.parse(text).key()
+        except ValueError as e:
+            return {"error": str(e)}
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((key, text, future))
+        return await future
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self.run_batch(batch))
+
+    async def run_batch(self, batch):
+        waiting = {}
+        for key, text, future in batch:
+            waiting.setdefault(key, (text, []))[1].append(future)
+        items = [(key, text) for key, (text, futures) in waiting.items()]
+        self.batches += 1
+        self.batched += len(items)
+        # one chunk for each worker
+        step = -(-len(items) // self.workers)
+        loop = asyncio.get_running_loop()
+        chunks = [items[i:i + step] for i in range(0, len(items), step)]
+        try:
+            done = await asyncio.gather(*(loop.run_in_executor(self.pool, _analyse_batch, chunk)
+                                          for chunk in chunks))
+        except Exception as e:
+            for text, futures in waiting.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for results in done:
+            for result in results:
+                key = result.pop("line")
+                del result["input"]
+                if "error" not in result:
+                    self.cache.put(key, result)
+                for future in waiting[key][1]:
+                    if not future.done():
+                        future.set_result(result)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "positions_searched": self.batched,
+            "cache": self.cache.stats(),
+            "workers": self.workers,
+        }
+
+    async def answer(self, msg, writer, lock):
+        try:
+            if msg.get("op") == "stats":
+                reply = self.stats()
+            elif "position" in msg:
+                reply = dict(await self.analyse(str(msg["position"])))
+            else:
+                reply = {"error": "expected a position"}
+        except Exception as e:
+            # whatever went wrong, the client gets an answer
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        if "id" in msg:
+            reply["id"] = msg["id"]
+        async with lock:
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+
+    async def handle(self, reader, writer):
+        """one connection: requests are answered as they finish, so a client may send several at once"""
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    msg = {}
+                if not isinstance(msg, dict):
+                    msg = {}
+                task = asyncio.create_task(self.answer(msg, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.batcher())
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+
+class Client:
+    """
+    Blocking client for a Server. search() works like search.Searcher.search
+    and choose_action() like cli.AI.choose_action, so a Client can play in
+    runner.py and cli.play()
+    """
+    def __init__(self, host=HOST, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.file = self.sock.makefile("rwb")
+        self.next_id = 0
+        self.nodes = 0
+        self.cancelled = False
+
+    def request(self, msg):
+        self.next_id += 1
+        msg = dict(msg, id=self.next_id)
+        self.file.write(json.dumps(msg).encode() + b"\n")
+        self.file.flush()
+        while True:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError("the server closed the connection")
+            reply = json.loads(line)
+            if reply.get("id") == self.next_id:
+                return reply
+
+    def analyse(self, position):
+        """the server's result dict for a bitboard.Position or a line of analyze.py input"""
+        if not isinstance(position, str):
+            if len(position.history) == position.moves:
+                position = "".join(map(str, position.history))
+            else:
+                position = ",".join(position.columns())
+        reply = self.request({"position": position})
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return reply
+
+    def stats(self):
+        return self.request({"op": "stats"})
+
+    def cancel(self):
+        self.cancelled = True
+
+    def search(self, pos, on_iteration=None):
+        self.cancelled = False
+        reply = self.analyse(pos)
+        self.nodes = reply["nodes"]
+        result = SearchResult(reply["move"], reply["score"], reply["depth"], reply["nodes"])
+        if on_iteration is not None:
+            on_iteration(result)
+        return result
+
+    def choose_action(self, state, train=False, time_limit=None):
+        move = self.search(state.position).move
+        actions = state.actions()
+        return move if move in actions else actions[0]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def available(host=HOST, port=DEFAULT_PORT):
+    """True if a server answers at host:port"""
+    try:
+        socket.create_connection((host, port), 0.2).close()
+        return True
+    except OSError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves Connect4 analysis on localhost")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--engine", choices=["minimax", "ai"], default="minimax")
+    parser.add_argument("--nodes", type=int, default=100000, help="minimax budget per position")
+    parser.add_argument("--time", type=float, default=None, help="minimax seconds per position")
+    parser.add_argument("--depth", type=int, default=4, help="ai lookahead")
+    parser.add_argument("--qtable", default=None, help="Q-table file for the ai")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--batch-wait", type=float, default=0.002, help="seconds to wait for a batch to fill")
+    args = parser.parse_args(argv)
+
+    server = Server(args.host, args.port, args.workers, args.batch_size, args.batch_wait,
+                    engine=args.engine, nodes=args.nodes, time_limit=args.time,
+                    depth=args.depth, qtable=args.qtable)
+    print(f"serving on {args.host}:{args.port} with {server.workers} workers")
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Endgame tablebase.
+
+    python tablebase.py --empty 10 --seeds 2000 --out endgame.c4tb
+
+Every reachable endgame is far too many positions to store, so the tablebase
+covers the endgames that come up: it plays `--seeds` random games up to
+`--empty` empty cells and solves every position in the subtrees below, each
+one exactly. Mirror images are stored once (Position.canonical()).
+
+File layout (little endian):
+    header   8s magic, I version, I empty, Q slots
+    keys     slots * uint64, open addressing (linear probing), 0 = free slot
+    values   slots * int8, 0 draw, +n / -n the player to move wins / loses
+             with search.py score WIN + n / -WIN - n
+Probes hash straight to a slot of the mapped file, so nothing is loaded into
+memory and a lookup touches one or two pages.
+"""
+
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+
+from bitboard import SIZE, Position
+from search import WIN, win_score
+
+MAGIC = b"C4TBASE\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endgame.c4tb")
+MASK64 = (1 << 64) - 1
+
+
+def slot_of(key, bits):
+    """fibonacci hashing of a position key onto 2**bits slots"""
+    return ((key * 0x9E3779B97F4A7C15) & MASK64) >> (64 - bits)
+
+
+def encode(score):
+    if score >= WIN:
+        return score - WIN
+    if score <= -WIN:
+        return score + WIN
+    return 0
+
+
+def decode(value):
+    if value > 0:
+        return value + WIN
+    if value < 0:
+        return value - WIN
+    return 0
+
+
+def solve(pos, table):
+    """exact search.py score of `pos`, remembering every position below it in `table`"""
+    key = pos.canonical()[0]
+    score = table.get(key)
+    if score is not None:
+        return score
+    if pos.winning_mask():
+        score = win_score(pos)
+    elif pos.moves >= SIZE - 1:
+        score = 0
+    else:
+        score = -2 * WIN
+        for col in pos.legal_columns():
+            pos.play(col)
+            score = max(score, -solve(pos, table))
+            pos.undo()
+    table[key] = score
+    return score
+
+
+def seeds(empty, count, rng):
+    """positions with `empty` free cells from random games that are still going"""
+    while count:
+        pos = Position()
+        while pos.moves < SIZE - empty and not pos.winning_mask():
+            pos.play(rng.choice(pos.legal_columns()))
+        if pos.moves == SIZE - empty and not pos.winning_mask():
+            count -= 1
+            yield pos
+
+
+def generate(empty, count, path=DEFAULT_PATH, seed=0, verbose=True):
+    """solves the endgames below `count` random positions with `empty` free cells and writes them to `path`"""
+    rng = random.Random(seed)
+    table = {}
+    start = time.perf_counter()
+    for i, pos in enumerate(seeds(empty, count, rng)):
+        solve(pos, table)
+        if verbose and (i + 1) % 100 == 0:
+            print(f"{i + 1} seeds, {len(table)} positions, {time.perf_counter() - start:.0f}s")
+
+    bits = max(1, (2 * len(table) - 1).bit_length())  # at most half full
+    slots = 1 << bits
+    keys = array("Q", bytes(8 * slots))
+    values = array("b", bytes(slots))
+    for key, score in table.items():
+        i = slot_of(key, bits)
+        while keys[i]:
+            i = (i + 1) & (slots - 1)
+        keys[i] = key
+        values[i] = encode(score)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, empty, slots))
+        keys.tofile(f)
+        values.tofile(f)
+    if verbose:
+        print(f"wrote {len(table)} positions to {path}")
+    return len(table)
+
+
+class Tablebase:
+    """
+    Read-only, memory-mapped tablebase. Opened on first use; a missing file
+    is an empty tablebase. `empty` is the most free cells a stored position has.
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.loaded = False
+        self.empty = -1
+        self.slots = 0
+
+    def load(self):
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, empty, slots = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} tablebase")
+        self.empty = empty
+        self.slots = slots
+        self.bits = slots.bit_length() - 1
+        start = HEADER.size
+        view = memoryview(self.mm)
+        self.keys = view[start:start + 8 * slots].cast("Q")
+        self.values = view[start + 8 * slots:start + 9 * slots].cast("b")
+
+    def first_move(self):
+        """the number of stones from which positions may be in the tablebase"""
+        if not self.loaded:
+            self.load()
+        return SIZE - self.empty if self.empty >= 0 else SIZE + 1
+
+    def probe(self, pos):
+        """the exact search.py score of `pos`, or None if it isn't stored"""
+        if not self.loaded:
+            self.load()
+        if SIZE - pos.moves > self.empty:
+            return None
+        key = pos.canonical()[0]
+        keys = self.keys
+        i = slot_of(key, self.bits)
+        while True:
+            k = keys[i]
+            if k == key:
+                return decode(self.values[i])
+            if not k:
+                return None
+            i = (i + 1) & (self.slots - 1)
+
+
+_default = None
+
+
+def default_tablebase():
+    """the shared tablebase at DEFAULT_PATH"""
+    global _default
+    if _default is None:
+        _default = Tablebase()
+    return _default
+
+
+def main(argv=None):
+    import argparse  # only the command line needs it, importers of this module don't
+
+    parser = argparse.ArgumentParser(description="Builds the Connect4 endgame tablebase")
+    parser.add_argument("--empty", type=int, default=10, help="most empty cells of a stored position")
+    parser.add_argument("--seeds", type=int, default=2000, help="random positions to solve the endgames of")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+    generate(args.empty, args.seeds, args.out, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
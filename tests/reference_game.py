@@ -0,0 +1,170 @@
+"""
+cli.Game as it was before the bitboard backend (lists of column strings,
+walks over the neighbourhood of a move), kept unchanged as the reference
+that test_game.py holds the current Game to.
+"""
+
+import random
+from copy import deepcopy
+
+
+class Game:
+    width = 7
+    height = 6
+    colours = "YR"
+    def __init__(self, state=None, player=None, targets=None):
+        if state is None:
+            state = ["" for i in range(Game.width)]
+        if player is None:
+            player = random.randint(0, 1)
+            targets = str(player) + str(1-player)
+        self.state = state
+        self.player = player
+        self.targets = targets
+        self.winner = None
+    
+    def getStateTuple(self):
+        return tuple(self.state)
+    
+    def getStateList(self):
+        return deepcopy(self.state)
+    
+    def show(self):
+        s = self.getStateTuple()
+        rows = f"Current State ({Game.colours[self.player]}'s turn):\n+" + "+".join(["---" for i in range(len(s))]) + "+\n" + ("\n|" + "+".join(["---" for i in range(len(s))]) + "|\n").join([
+            "| " + " | ".join([
+                Game.colours[int(self.targets[int(s[i][-(Game.height-h)])])] if len(s[i]) >= (Game.height-h) else " " for i in range(len(s))
+                ]) + " |" for h in range(0, Game.height)
+            ]) + "\n+" + "+".join(["---" for i in range(len(s))]) + "+"
+        print(rows)
+    
+    def makeMove(self, action):
+        """
+        `action` is simply the int val for the col to add the number to
+        assumes action is a legal move
+        """
+        # print("state before", self.state)
+        # print("\t", self.targets[self.player])
+        self.state[action] = self.targets[self.player] + self.state[action]
+        if self.someoneWins(action, self.targets[self.player]):
+            print("yes", self.player, "wins. winning move: action", action)
+            self.winner = self.player
+        elif self.full():
+            # print("fullllllll", self.fu)
+            self.winner = -1
+        # print("state after", self.state)
+        self.player = 1-self.player
+        # Also, now, invert the bits
+        self.invertBits()
+        self.targets = self.targets[::-1]
+
+    def invertBits(self):
+        new_cols = []
+        for i in self.state:
+            if i == "":
+                new_cols.append(i)
+                continue
+            new_col = str(int("1"*len(i)) - int(i))
+            new_col = "0" * (len(i) - len(new_col)) + new_col
+            new_cols.append(new_col)
+        self.state = new_cols
+
+    
+    def full(self):
+        return all([len(i) == 6 for i in self.getStateTuple()])
+    
+    def otherPlayer(self):
+        """returns the index of the other player"""
+        return 1-self.player
+    
+    def otherTarget(self, target):
+        return 1-target
+    
+    @classmethod
+    def actionsFromState(self, state):
+        s = Game(state=list(state), player=self.player, targets=self.targets)
+        return s.actions()
+
+    def actions(self):
+        """returns all the legal moves one can make"""
+
+        # Out of the cells which actually have space for a move,
+        emptyCols = [i for i in range(len(self.state)) if len(self.state[i]) <= 5]
+        #print("these are the empty cols", emptyCols)
+
+        # Sees if there's a winning move for current_player, if yes, returns it.
+        for i in emptyCols:
+            if self.someoneWins(i, self.player):
+                return [i]
+
+        # otherwise, finds if there are any winning moves for the opponent, blocks them
+        legality_bound = [i for i in emptyCols if self.someoneWins(i, self.otherPlayer())]
+        # print("legality bound", legality_bound)
+        # if len(legality_bound) > 1:
+            #print("Ha! You're under a trap! Need to perform all", legality_bound, "to win")
+        if len(legality_bound):
+            return legality_bound
+        else:
+            # No legality bound moves
+            return emptyCols
+
+
+    def getVal(self, index):
+        """given an index, gets the val associated with it or None.
+        expects index[1] to be a negative value ranging from -1 to -6"""
+        s = self.getStateTuple()
+        try:
+            return s[index[0]][index[1]] if len(s[index[0]]) >= -index[1] else None
+        except IndexError:
+            return None
+    
+    def applyVector(self, vector, state):
+        """applies `vector` on `state` and returns the new state as a tuple"""
+        new_index = tuple([sum(i) for i in zip(vector, state)])
+        if new_index[0] < 0 or new_index[0] > 6 or new_index[1] > -1 or new_index[1] < -6:
+            return None
+        return new_index
+
+    
+    def someoneWins(self, action, target: str):
+        """
+        this program doesn't have a standard victory check algo as that's quite expensive
+        instead, it sees if the `action` leads to a victory.
+        Thus, it assumes that the game hadn't been won before `action`
+        IDEA:
+        1) starts from `action` with the vectors for NE, E, SE, S, SW, W, NW and graphs consecutive vectors
+        of the same colour. if any of them have a length greater than 4, return true right away
+        2) having mapped everything, sees if the conjunction of the opposites leads to a sequence >= 4
+        """
+        target = str(target)
+        # print("seeing if", target, "wins upon action", action)
+        vectors = [(1, -1), (1, 0), (1, 1)]
+        action_index = (action, -(len(self.state[action])+1))
+        for vector in vectors:
+            dirs = [(vector, action_index), (tuple([-1*i for i in vector]), action_index)]
+            chain_len = 1
+            #print(vector)
+            while dirs and chain_len != 4:
+                current_vector = dirs.pop()  # remember this is a tuple of the vector and the index
+                #print("considering vector, intial", current_vector)
+                new_index = self.applyVector(*current_vector) # get the new_index by adding the vector to the index
+                if new_index is None:
+                    continue
+                #print("\tthis is the new index", new_index)
+                if self.getVal(new_index) == target:
+                    #print("\t  equals target", target)
+                    dirs.append((current_vector[0], new_index))
+                    chain_len += 1
+                #print("chain length", chain_len)
+            if chain_len >= 4:
+                #print("\ttrue")
+                return True
+        # now take care of the vector pointing downwards
+        try:
+            other_index = list(reversed(self.state[action])).index(str(self.otherTarget(int(target))))
+            #print("\t", other_index + 1 >= 4)
+            return other_index + 1 >= 4
+        except ValueError:
+            #print("\t", len(self.state[action]) + 1 >= 4)
+            return len(self.state[action]) + 1 >= 4
+    
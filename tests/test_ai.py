@@ -0,0 +1,89 @@
+import random
+import time
+
+import pytest
+
+import cli
+from bitboard import Position
+
+
+def game_after(cols, player=0):
+    game = cli.Game(player=player, targets=str(player) + str(1 - player))
+    for col in cols:
+        game.makeMove(col)
+    return game
+
+
+def test_mirrored_moves_share_a_q_key():
+    game = game_after([0, 0, 1])
+    mirrored = game_after([6, 6, 5])
+    for action in range(7):
+        assert cli.AI.key(game, action) == cli.AI.key(mirrored, 6 - action)
+    assert cli.AI.key(game, 2) != cli.AI.key(game, 3)
+
+
+def test_q_values_are_shared_with_the_mirror_image():
+    model = cli.AI(use_book=False)
+    model.update_q_val(game_after([0, 0, 1]), 2, 1, 0, 0)
+    assert model.get_q_val(game_after([6, 6, 5]), 4) == model.alpha
+
+
+def test_anytime_search_stops_when_every_line_ends():
+    # a drawn out game with three empty cells left
+    pos = Position()
+    while pos.moves < 39:
+        pos.play(next(col for col in pos.legal_columns() if not pos.is_winning_move(col)))
+    assert not pos.has_won()
+    model = cli.AI(use_book=False, use_tablebase=False)
+    game = cli.Game(state=pos.columns(), player=0, targets="01")
+    start = time.perf_counter()
+    model.choose_action(game, train=False, time_limit=5)
+    assert time.perf_counter() - start < 1
+    assert model.last_search.depth <= 3
+
+
+def test_anytime_search_keeps_to_its_deadline():
+    model = cli.AI(use_book=False)
+    game = game_after([3, 3, 2])
+    start = time.perf_counter()
+    action = model.choose_action(game, train=False, time_limit=0.2)
+    assert time.perf_counter() - start < 1
+    assert action in game.actions()
+    assert model.last_search.depth >= 1
+
+
+def test_anytime_search_deepens_past_cached_results():
+    model = cli.AI(use_book=False)
+    game = game_after([3, 3, 2])
+    model.best_action(game, 1)
+    for i in range(2):
+        model.choose_action(game, train=False, time_limit=0.2)
+        assert model.last_search.depth > 1
+
+
+def test_cached_values_follow_q_writes():
+    model = cli.AI(use_book=False)
+    game = game_after([3, 3, 2])
+    assert model.getBestFuture(game, 0, 2) == 0
+    reply = game_after([3, 3, 2, 0])
+    model.update_q_val(reply, 4, 1, 0, 0)
+    fresh = cli.AI(use_book=False)
+    fresh.q.update(model.q)
+    assert model.getBestFuture(game, 0, 2) == fresh.getBestFuture(game, 0, 2) == -model.alpha
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_actions_take_wins_and_block_threats(seed):
+    rng = random.Random(seed)
+    game = game_after([])
+    while game.winner is None and game.actions():
+        pos = game.position
+        wins = [c for c in pos.legal_columns() if pos.is_winning_move(c)]
+        threats = [c for c in pos.legal_columns() if game.someoneWins(c, "1")]
+        if wins:
+            assert game.actions() == wins[:1]
+        elif threats:
+            assert game.actions() == threats
+        else:
+            assert game.actions() == pos.legal_columns()
+        game.makeMove(rng.choice(pos.legal_columns()))
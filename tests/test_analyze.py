@@ -0,0 +1,42 @@
+import pytest
+
+import analyze
+
+
+def same(a, b):
+    return (a.current, a.mask, a.moves) == (b.current, b.mask, b.moves)
+
+
+def test_the_three_forms_give_the_same_position():
+    pos = analyze.parse("33245")
+    assert same(pos, analyze.parse("('', '', '1', '01', '0', '1', '')"))
+    assert same(pos, analyze.parse(",,1,01,0,1,"))
+    assert same(pos, analyze.parse(" , ,1, 01,0,1, \n"))
+
+
+@pytest.mark.parametrize("text", [
+    "(1)", "(1, 2, 3, 4, 5, 6, 7)", "('', '', '')", "('2', '', '', '', '', '', '')",
+    "(", "(" * 1000 + ")" * 1000, "3x", "7", "0000000", "01010101", ",,11,,,,", ",,0,0,0,,",
+])
+def test_bad_lines_are_value_errors(text):
+    with pytest.raises(ValueError):
+        analyze.parse(text)
+
+
+def test_every_line_gets_a_result_in_order():
+    lines = ["# positions", "33245", "", "(1)", "(", "0101010", ",,,,,,"]
+    results = list(analyze.analyse(lines, workers=0, nodes=2000))
+    assert [r["line"] for r in results] == [2, 4, 5, 6, 7]
+    good, tuple_of_int, unparsed, over, empty = results
+    assert analyze.parse("33245").can_play(good["move"]) and good["nodes"] >= 0
+    assert "error" in tuple_of_int and "error" in unparsed
+    assert over["error"] == "the game is over"
+    assert "move" in empty
+
+
+def test_a_pool_gives_the_same_results():
+    lines = ["33245", "(1)", "3322", "44"]
+    here = list(analyze.analyse(lines, workers=0, nodes=2000))
+    pooled = list(analyze.analyse(lines, workers=2, nodes=2000, chunksize=1))
+    strip = lambda results: [{k: v for k, v in r.items() if k != "ms"} for r in results]
+    assert strip(pooled) == strip(here)
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import batchsim
+import cli
+from bitboard import Position
+
+
+def replay(transitions, game):
+    """plays game `game` of a batch again on a Position, checking every row on the way"""
+    rows = np.flatnonzero(transitions.game == game)
+    pos = Position()
+    for i, row in enumerate(rows):
+        assert transitions.ply[row] == i
+        assert not transitions.done[row] or row == rows[-1]
+        state = SimpleNamespace(position=pos)
+        cols = [c for c in pos.legal_columns() if cli.AI.key(state, c) == int(transitions.key[row])]
+        assert cols, "the key is not a legal move"
+        pos.play(cols[0])
+        state = SimpleNamespace(position=pos)
+        assert int(transitions.after[row]) == cli.AI.key(state, 0) >> 3 << 3
+    assert transitions.done[rows[-1]]
+    assert pos.has_won() or pos.full()
+    return rows, pos
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_batch_games_are_legal_and_scored(seed):
+    transitions = batchsim.simulate(50, seed=seed)
+    for game in range(50):
+        rows, pos = replay(transitions, game)
+        rewards = transitions.reward[rows].tolist()
+        if pos.has_won():
+            assert rewards[-1] == 1 and rewards[-2] == -1
+            assert not any(rewards[:-2])
+        else:
+            assert not any(rewards)
+
+
+def test_a_batch_only_depends_on_its_seed():
+    runs = [batchsim.simulate(20, seed=seed) for seed in (4, 4, 5)]
+    assert all(np.array_equal(a, b) for a, b in zip(runs[0], runs[1]))
+    assert not np.array_equal(runs[0].key, runs[2].key)
+
+
+def test_update_model_learns_the_winning_moves():
+    model = cli.AI(use_book=False)
+    generation = model.generation
+    transitions = batchsim.simulate(1, seed=2)
+    written = batchsim.update_model(model, transitions)
+    assert written == 2 and model.generation > generation
+    assert model.q[int(transitions.key[-1])] == pytest.approx(model.alpha)
+    assert model.q[int(transitions.key[-2])] == pytest.approx(-model.alpha)
+    assert model.dirty == set(model.q)
@@ -0,0 +1,11 @@
+import pytest
+
+import bench
+from bitboard import Position
+
+
+@pytest.mark.parametrize("name", sorted(bench.PERFT_POSITIONS))
+def test_perft_counts(name):
+    pos = Position.from_columns(bench.PERFT_POSITIONS[name])
+    for depth, expected in enumerate(bench.PERFT_EXPECTED[name][:4], 1):
+        assert bench.perft(pos, depth) == expected
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from bitboard import CELL_WEIGHT, H1, HEIGHT, LINES, WIDTH, Position, alignment
+
+
+def random_position(rng, plies):
+    pos = Position()
+    for i in range(plies):
+        if pos.has_won() or pos.full():
+            break
+        pos.play(rng.choice(pos.legal_columns()))
+    return pos
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_columns_round_trip(seed):
+    rng = random.Random(seed)
+    pos = random_position(rng, rng.randrange(30))
+    again = Position.from_columns(pos.columns())
+    assert (again.current, again.mask, again.moves) == (pos.current, pos.mask, pos.moves)
+
+
+def test_four_in_a_row_in_every_direction():
+    assert Position.from_moves("0101010").has_won()      # vertical
+    assert Position.from_moves("0011223").has_won()      # horizontal
+    # diagonals, "1" is the player that just moved
+    assert Position.from_columns(["1", "10", "100", "1000", "", "", ""]).has_won()
+    assert Position.from_columns(["", "", "", "1000", "100", "10", "1"]).has_won()
+    assert not Position.from_moves("001122").has_won()
+    assert not alignment(0)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_play_and_undo_restore_the_position(seed):
+    rng = random.Random(seed)
+    pos = random_position(rng, 20)
+    before = (pos.current, pos.mask, pos.moves)
+    for col in pos.legal_columns():
+        pos.play(col)
+        pos.undo()
+        assert (pos.current, pos.mask, pos.moves) == before
+
+
+def from_scratch(pos):
+    return Position(pos.current, pos.mask, pos.moves)
+
+
+def assert_keys_match(pos):
+    fresh = from_scratch(pos)
+    assert (pos.board_key, pos.mirror_key) == (fresh.board_key, fresh.mirror_key)
+    assert pos.key() == fresh.key()
+    assert pos.canonical() == fresh.canonical()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_keys_match_keys_from_scratch(seed):
+    rng = random.Random(seed)
+    pos = Position()
+    seen = [from_scratch(pos)]
+    while not pos.has_won() and not pos.full():
+        pos.play(rng.choice(pos.legal_columns()))
+        assert_keys_match(pos)
+        seen.append(from_scratch(pos))
+    # and on the way back
+    while pos.history:
+        pos.undo()
+        seen.pop()
+        assert_keys_match(pos)
+        assert (pos.current, pos.mask) == (seen[-1].current, seen[-1].mask)
+
+
+def test_mirror_images_share_a_canonical_key():
+    pos = Position.from_moves("0012")
+    mirrored = Position.from_moves("6654")
+    assert pos.canonical()[0] == mirrored.canonical()[0]
+    assert pos.canonical()[1] != mirrored.canonical()[1]
+
+
+def test_cell_weights_count_the_lines_through_each_cell():
+    assert sum(CELL_WEIGHT.values()) == 4 * len(LINES) == 4 * 69
+    corners = [0, HEIGHT - 1, (WIDTH - 1) * H1, (WIDTH - 1) * H1 + HEIGHT - 1]
+    assert [CELL_WEIGHT[cell] for cell in corners] == [3] * 4
+    assert max(CELL_WEIGHT.values()) == CELL_WEIGHT[3 * H1 + 2] == 13
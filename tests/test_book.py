@@ -0,0 +1,23 @@
+from book import OpeningBook, generate, positions
+from bitboard import WIDTH, Position
+
+
+def test_book_answers_every_position_and_its_mirror(tmp_path):
+    path = str(tmp_path / "book.c4b")
+    count = generate(2, path=path, max_nodes=2000, verbose=False)
+    book = OpeningBook(path)
+    assert len(book) == count == len(list(positions(2)))
+    for pos in positions(2):
+        move, score = book.probe(pos)
+        assert pos.can_play(move)
+        mirrored = Position.from_columns(pos.columns()[::-1])
+        if mirrored.columns() == pos.columns():
+            continue  # symmetric, either of the two mirrored moves is right
+        assert book.probe(mirrored) == (WIDTH - 1 - move, score)
+    assert book.probe(Position.from_moves("333")) is None
+
+
+def test_a_missing_book_is_empty(tmp_path):
+    book = OpeningBook(str(tmp_path / "none.c4b"))
+    assert len(book) == 0
+    assert book.probe(Position()) is None
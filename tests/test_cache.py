@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import cli
+from cache import BoundedStore, LRUCache
+
+
+def test_lru_cache_drops_the_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "capacity": 2, "hits": 3, "misses": 1, "hit_rate": 0.75, "evictions": 1}
+
+
+def test_bounded_store_keeps_the_most_used():
+    evicted = []
+    store = BoundedStore(3, sample=3, on_evict=evicted.append)
+    store["a"], store["b"], store["c"] = 1, 2, 3
+    store.get("a")
+    store.get("b")
+    store["d"] = 4
+    assert evicted == ["c"] and len(store) == 3
+    assert dict(store.items()) == {"a": 1, "b": 2, "d": 4}
+    assert store.stats()["evictions"] == 1
+
+
+def test_bounded_store_needs_a_size():
+    with pytest.raises(ValueError):
+        BoundedStore()
+    assert BoundedStore(max_bytes=10 * BoundedStore.ENTRY_BYTES).capacity == 10
+
+
+def test_a_capped_ai_stays_under_its_cap():
+    random.seed(5)
+    model = cli.AI(max_entries=200)
+    for i in range(10):
+        cli.selfplay(model)
+    stats = model.q.stats()
+    assert len(model.q) <= 200 and stats["evictions"] > 0
+    # evicted keys don't stay dirty, so they're never written back
+    assert model.dirty <= set(model.q)
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT = """
+import random, sys
+random.seed(7)
+state = random.getstate()
+import cli
+assert random.getstate() == state, "random state changed"
+heavy = {"argparse", "multiprocessing", "numpy", "json", "checkpoint", "ntuple", "mcts", "server"}
+assert not heavy & set(sys.modules), heavy & set(sys.modules)
+assert not cli.default_book().loaded and not cli.default_tablebase().loaded
+"""
+
+
+def test_importing_cli_has_no_side_effects():
+    done = subprocess.run([sys.executable, "-c", IMPORT], cwd=ROOT, stdin=subprocess.DEVNULL,
+                          capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0, done.stderr
+    assert done.stdout == ""
+
+
+def test_train_subcommand_writes_the_table(tmp_path, capsys):
+    out = str(tmp_path / "map.q")
+    assert cli.main(["train", "3", "--out", out]) in (0, None)
+    assert len(cli.AI.load(out).table) > 0
+
+
+def test_help_lists_the_subcommands():
+    done = subprocess.run([sys.executable, "cli.py", "--help"], cwd=ROOT, stdin=subprocess.DEVNULL,
+                          capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0
+    for command in ("train", "play", "analyze", "bench"):
+        assert command in done.stdout
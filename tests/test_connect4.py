@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import connect4 as c4
+
+
+def plain(board):
+    """the board as the list of lists the functions took before Board"""
+    return [list(row) for row in board]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_board_agrees_with_plain_lists(seed):
+    rng = random.Random(seed)
+    board = c4.initial_state()
+    while True:
+        rows = plain(board)
+        assert c4.player(rows) == c4.player(board)
+        assert c4.actions(rows) == c4.actions(board)
+        assert c4.winner(rows) == c4.winner(board)
+        assert c4.terminal(rows) == c4.terminal(board)
+        pos, bits = c4.to_position(board), c4.to_position(rows)
+        assert (pos.current, pos.mask, pos.moves) == (bits.current, bits.mask, bits.moves)
+        if c4.terminal(board):
+            break
+        action = rng.choice(sorted(c4.actions(board)))
+        after = c4.result(board, action)
+        assert plain(c4.result(rows, action)) == plain(after)
+        board = after
+    assert c4.utility(board) == {c4.R: 1, c4.Y: -1, None: 0}[c4.winner(board)]
+
+
+def test_result_leaves_the_board_alone():
+    board = c4.initial_state()
+    before = board.snapshot()
+    c4.result(board, (0, 3))
+    assert board.snapshot() == before and board.turn == c4.R
+    with pytest.raises(ValueError):
+        c4.result(board, (1, 3))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_undo_takes_back_play(seed):
+    rng = random.Random(seed)
+    board = c4.initial_state()
+    seen = []
+    while not c4.terminal(board):
+        seen.append((board.snapshot(), board.turn, list(board.heights), board.position.key()))
+        board.play(rng.choice([j for i, j in board.actions()]))
+    while seen:
+        board.undo()
+        assert (board.snapshot(), board.turn, list(board.heights), board.position.key()) == seen.pop()
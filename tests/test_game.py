@@ -0,0 +1,48 @@
+import contextlib
+import io
+import random
+
+import pytest
+
+import cli
+from reference_game import Game as ReferenceGame
+
+
+def shown(game):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        game.show()
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_games_match_the_reference(seed):
+    rng = random.Random(seed)
+    player = rng.randint(0, 1)
+    targets = str(player) + str(1 - player)
+    game = cli.Game(player=player, targets=targets)
+    ref = ReferenceGame(player=player, targets=targets)
+    while game.winner is None:
+        col = rng.choice(game.position.legal_columns())
+        game.makeMove(col)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ref.makeMove(col)
+        assert game.getStateTuple() == ref.getStateTuple()
+        # the reference's own win check looks one cell above the stone just
+        # played, so its winner isn't compared
+        assert (game.player, game.targets) == (ref.player, ref.targets)
+        assert shown(game) == shown(ref)
+    if game.winner == -1:
+        assert game.position.full() and not game.position.has_won()
+    else:
+        # the player that made the last move
+        assert game.winner == 1 - game.player and game.position.has_won()
+
+
+def test_state_round_trips():
+    state = ["", "", "1", "01", "0", "1", ""]
+    game = cli.Game(state=list(state), player=1, targets="10")
+    assert game.getStateList() == state
+    game.makeMove(3)
+    game.undoMove()
+    assert game.getStateList() == state
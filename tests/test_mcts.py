@@ -0,0 +1,41 @@
+import cli
+from bitboard import Position
+from mcts import MCTS
+
+
+def test_mcts_keeps_its_tree_only_for_positions_that_follow():
+    mcts = MCTS(playouts=300, time_limit=None, seed=0)
+    mcts.search(Position.from_columns(["0", "1", "", "", "", "", ""]))
+    mcts.search(Position.from_columns(["", "", "01", "", "", "", ""]))
+    assert mcts.root.visits == 300
+
+    pos = Position()
+    mcts.search(pos)
+    pos.play(3)
+    pos.play(3)
+    mcts.search(pos)
+    assert mcts.root.visits > 300
+
+
+def test_mcts_never_plays_into_a_full_column():
+    mcts = MCTS(playouts=300, time_limit=None, seed=0)
+    mcts.choose_action(cli.Game(state=[""] * 7))
+    assert mcts.choose_action(cli.Game(state=["101010", "", "", "", "", "", ""])) != 0
+
+
+def test_parallel_mcts_reports_and_can_be_cancelled():
+    mcts = MCTS(playouts=400, time_limit=None, workers=2, seed=0)
+    try:
+        pos = Position.from_moves("3322")
+        seen = []
+        result = mcts.search(pos, seen.append)
+        assert seen and seen[-1] == result
+        assert result.nodes >= 400 and pos.can_play(result.move)
+        assert mcts.root.visits == result.nodes
+        assert pos.history == [3, 3, 2, 2]
+
+        mcts.playouts = 4000
+        result = mcts.search(pos, lambda result: mcts.cancel())
+        assert result.nodes == 2 * 1000
+    finally:
+        mcts.close()
@@ -0,0 +1,66 @@
+import json
+import random
+
+import pytest
+
+import cli
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.disable()
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_enable_wraps_and_disable_restores():
+    original = cli.Game.__dict__["makeMove"]
+    metrics.enable()
+    assert metrics.enabled() and cli.Game.__dict__["makeMove"] is not original
+    random.seed(6)
+    cli.selfplay(cli.AI(use_book=False))
+    spans = metrics.snapshot()["spans"]
+    assert spans["Game.makeMove"]["calls"] > 0
+    # recursive calls are counted, but only the outermost is timed
+    assert spans["AI.getBestFuture"]["calls"] > 0 and spans["AI.getBestFuture"]["seconds"] > 0
+    metrics.disable()
+    assert not metrics.enabled() and cli.Game.__dict__["makeMove"] is original
+
+
+def test_selfplay_counts_games_and_plies():
+    random.seed(6)
+    model = cli.AI(use_book=False)
+    for i in range(3):
+        cli.selfplay(model)
+    counters = metrics.snapshot()["counters"]
+    assert counters["games"] == 3 and 3 * 7 <= counters["plies"] <= 3 * 42
+
+
+def test_training_writes_report_lines(tmp_path, capsys):
+    report = str(tmp_path / "metrics.jsonl")
+    random.seed(6)
+    cli.train(4, str(tmp_path / "map.q"), report=report, report_every=0)
+    assert capsys.readouterr().out == ""
+    with open(report) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 5
+    assert lines[-1]["counters"]["games"] == 4
+    assert lines[-1]["q_size"] > 0 and "games_per_sec" in lines[-1]["rates"]
+
+
+@pytest.mark.parametrize("argv", [
+    ["train", "1", "--ntuple", "--json", "x.json"],
+    ["train", "1", "--ntuple", "--workers", "2"],
+    ["train", "1", "--workers", "2", "--metrics", "m.jsonl"],
+    ["train", "1", "--workers", "2", "--checkpoint", "ckpt"],
+])
+def test_options_that_would_be_ignored_are_refused(argv, capsys, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit) as exit:
+        cli.main(argv)
+    assert exit.value.code == 2
+    assert "can't be used with" in capsys.readouterr().err
+    assert not list(tmp_path.iterdir())
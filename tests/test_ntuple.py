@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+import cli
+from bitboard import H1, HEIGHT
+from ntuple import NTupleAI, NTupleNetwork, random_tuples
+from test_ai import game_after
+
+
+def test_update_moves_the_value_to_the_target():
+    model = NTupleAI(use_book=False)
+    game = game_after([3, 3, 2])
+    generation = model.generation
+    old = model.get_q_val(game, 4)
+    model.update_q_val(game, 4, 1, 0, old)
+    assert model.get_q_val(game, 4) == pytest.approx(old + model.alpha * (1 - old), abs=1e-5)
+    assert model.generation > generation
+    model.update_q_val(game, 5, 0, 0, 0)
+    assert model.generation == generation + 1
+
+
+def test_mirror_images_have_the_same_value():
+    model = NTupleAI(use_book=False)
+    model.update_q_val(game_after([3, 3, 2]), 4, 1, 0, 0)
+    model.update_q_val(game_after([0, 1, 1]), 2, -1, 0, 0)
+    game, mirrored = game_after([0, 1, 2, 2]), game_after([6, 5, 4, 4])
+    for action in range(7):
+        assert model.get_q_val(game, action) == pytest.approx(model.get_q_val(mirrored, 6 - action))
+
+
+def test_tuples_are_connected_cells():
+    tuples = random_tuples(20, 6, seed=3)
+    assert tuples.shape == (20, 6)
+    for cells in tuples:
+        assert len(set(cells.tolist())) == 6
+        cols, rows = np.divmod(cells, H1)
+        assert all(rows < HEIGHT)
+        # every cell touches one before it
+        for i in range(1, 6):
+            assert (np.maximum(abs(cols[:i] - cols[i]), abs(rows[:i] - rows[i])) == 1).any()
+
+
+def test_network_save_and_load(tmp_path):
+    model = NTupleAI(NTupleNetwork(random_tuples(10, 4)), use_book=False)
+    game = game_after([3, 3, 2])
+    model.update_q_val(game, 4, 1, 0, 0)
+    path = str(tmp_path / "net.npz")
+    model.save(path)
+    loaded = NTupleAI.load(path, use_book=False)
+    assert np.array_equal(loaded.network.tuples, model.network.tuples)
+    assert loaded.q_vals(game, game.actions()) == model.q_vals(game, game.actions())
+
+
+def test_training_writes_the_network(tmp_path):
+    random.seed(4)
+    model = NTupleAI(NTupleNetwork(random_tuples(10, 4)))
+    path = str(tmp_path / "net.npz")
+    cli.train(3, path, model=model)
+    assert model.network.weights.any()
+    assert np.array_equal(NTupleNetwork.load(path).weights, model.network.weights)
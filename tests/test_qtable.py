@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+import cli
+from qtable import QTableFile, write_qtable
+
+
+def test_exact_files_read_back_every_value(tmp_path):
+    rng = random.Random(0)
+    q = {rng.getrandbits(60): rng.uniform(-1, 1) for i in range(1000)}
+    write_qtable(tmp_path / "t.q", q, exact=True)
+    table = QTableFile(tmp_path / "t.q")
+    assert len(table) == len(q)
+    assert dict(table.items()) == q
+    assert all(table.get(key) == val for key, val in q.items())
+    assert table.get(12345, 0) == 0 and 12345 not in table
+    table.close()
+
+
+def test_float32_files_round_to_float32(tmp_path):
+    write_qtable(tmp_path / "t.q", {3: 0.1, 1: -0.5})
+    table = QTableFile(tmp_path / "t.q")
+    assert list(table.keys) == [1, 3]
+    assert table.get(1) == -0.5 and table.get(3) == pytest.approx(0.1, rel=1e-7)
+    table.close()
+
+
+def test_a_saved_ai_plays_from_the_file(tmp_path):
+    random.seed(0)
+    model = cli.AI(use_book=False)
+    for i in range(5):
+        cli.selfplay(model)
+    model.save(tmp_path / "map.q")
+    loaded = cli.AI.load(tmp_path / "map.q", use_book=False)
+    assert not loaded.q
+    for key, val in model.q.items():
+        assert loaded.table.get(key) == pytest.approx(val, rel=1e-6)
+
+
+def test_other_files_are_refused(tmp_path):
+    (tmp_path / "junk.q").write_bytes(b"not a q-table at all, really")
+    with pytest.raises(ValueError):
+        QTableFile(tmp_path / "junk.q")
@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+import connect4 as c4
+from search import Searcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def runner():
+    """the globals of runner.py, run headless until its first wait for an event"""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame = pytest.importorskip("pygame")
+    path = os.path.join(ROOT, "runner.py")
+    with open(path) as f:
+        code = compile(f.read(), path, "exec")
+    namespace = {"__name__": "runner"}
+    wait = pygame.event.wait
+    pygame.event.wait = lambda *args: pygame.event.Event(pygame.QUIT)
+    cwd = os.getcwd()
+    os.chdir(ROOT)  # for the font
+    try:
+        with pytest.raises(SystemExit):
+            exec(code, namespace)
+    finally:
+        pygame.event.wait = wait
+        os.chdir(cwd)
+    yield namespace
+    pygame.quit()
+
+
+def board_after(cols):
+    board = c4.initial_state()
+    for col in cols:
+        board.play(col)
+    return board
+
+
+class Unreachable:
+    """a searcher whose server has gone away"""
+    cancelled = False
+
+    def search(self, pos, on_iteration=None):
+        raise OSError("connection refused")
+
+
+def think(runner, searcher, cols=(3, 3, 2, 4, 4, 2, 1, 5)):
+    thinker = runner["Thinker"](board_after(cols), searcher)
+    thinker.start()
+    thinker.join(30)
+    assert not thinker.is_alive()
+    return thinker
+
+
+def test_the_search_runs_in_the_background(runner):
+    pygame = runner["pygame"]
+    pygame.event.clear()
+    thinker = think(runner, Searcher(max_nodes=2000))
+    assert thinker.result is not None and thinker.depth > 0
+    assert thinker.board.position.can_play(thinker.result.move)
+    assert pygame.event.get(runner["SEARCH_DONE"])
+
+
+def test_a_cancelled_search_has_no_result(runner):
+    searcher = Searcher(max_nodes=2000)
+    searcher.cancel()
+    assert think(runner, searcher).result is None
+
+
+def test_a_lost_server_falls_back_to_minimax(runner):
+    thinker = think(runner, Unreachable())
+    assert isinstance(thinker.searcher, Searcher)
+    assert thinker.result is not None
+
+
+def test_only_the_events_that_matter_wake_the_loop(runner):
+    pygame = runner["pygame"]
+    assert pygame.event.get_blocked(pygame.MOUSEMOTION)
+    assert pygame.event.get_blocked(pygame.KEYDOWN)
+    for event in (pygame.QUIT, pygame.MOUSEBUTTONDOWN, runner["SEARCH_DONE"], *runner["EXPOSED"]):
+        assert not pygame.event.get_blocked(event)
+
+
+def test_rendered_text_is_cached_and_bounded(runner):
+    text, font, white = runner["text"], runner["mediumFont"], runner["white"]
+    assert text(font, "Play as Red", white) is text(font, "Play as Red", white)
+    for depth in range(100):
+        text(font, f"Thinking... depth {depth}", white)
+    assert len(runner["_text"]) == runner["_text"].capacity == 32
+
+
+def test_drawing_reports_only_what_it_covered(runner):
+    assert runner["draw_tile"](2, 3) == runner["tiles"][2][3]
+    assert runner["draw_title"]("Play as R") == runner["titleArea"]
+    assert runner["draw_menu"]() == runner["screen"].get_rect()
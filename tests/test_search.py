@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import connect4 as c4
+import tablebase
+from bitboard import COLUMNS, winning_cells
+from search import Searcher, popcount
+
+
+def test_search_scores_match_solved_endgames():
+    for pos in tablebase.seeds(10, 30, random.Random(0)):
+        assert Searcher().search(pos.copy()).score == tablebase.solve(pos.copy(), {})
+
+
+def test_search_leaves_the_position_as_it_was():
+    pos = next(tablebase.seeds(12, 1, random.Random(1)))
+    before = (pos.current, pos.mask, pos.moves, list(pos.history))
+    Searcher(max_nodes=500).search(pos)
+    assert (pos.current, pos.mask, pos.moves, list(pos.history)) == before
+
+
+def board_after(cols):
+    board = c4.initial_state()
+    for col in cols:
+        board = c4.result(board, c4.column_action(board, col))
+    return board
+
+
+def test_minimax_wins_and_blocks():
+    board = board_after([0, 0, 1, 1, 2, 2])
+    assert c4.minimax(board, max_nodes=2000) == c4.column_action(board, 3)
+    board = board_after([0, 0, 1, 1, 2])
+    assert c4.minimax(board, max_nodes=2000)[1] == 3
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_moves_making_the_most_winning_cells_come_first(seed):
+    pos = next(tablebase.seeds(16, 1, random.Random(seed)))
+    moves = pos.legal_mask()
+    cols = Searcher().order(pos, moves)
+    assert sorted(cols) == pos.legal_columns()
+
+    def made(col):
+        move = moves & COLUMNS[col]
+        return popcount(winning_cells(pos.current | move, pos.mask | move))
+    assert made(cols[0]) == max(made(c) for c in cols)
+    assert Searcher().order(pos, moves, first=cols[-1])[0] == cols[-1]
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import server
+from bitboard import Position
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((server.HOST, 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def running():
+    """a Server on a free port, served from a thread of its own"""
+    port = free_port()
+    srv = server.Server(port=port, workers=1, batch_wait=0.05, nodes=2000)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(srv.serve(), loop)
+    for i in range(100):
+        if server.available(port=port):
+            break
+        time.sleep(0.05)
+    yield srv, port
+    asyncio.run_coroutine_threadsafe(stop(), loop).result(30)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+    loop.close()
+
+
+async def stop():
+    """cancels everything else running on the loop, the server included, and waits for it"""
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def raw(port, lines):
+    """sends `lines` all at once and reads a reply for each"""
+    with socket.create_connection((server.HOST, port), 30) as sock:
+        sock.sendall(b"".join(line + b"\n" for line in lines))
+        f = sock.makefile("rb")
+        return [json.loads(f.readline()) for line in lines]
+
+
+def test_client_gets_moves_and_errors(running):
+    srv, port = running
+    client = server.Client(port=port)
+    try:
+        assert client.sock.gettimeout() == server.DEFAULT_TIMEOUT
+        pos = Position.from_moves("3322")
+        result = client.search(pos)
+        assert pos.can_play(result.move) and client.nodes == result.nodes
+        assert client.analyse("3322")["move"] == result.move
+        with pytest.raises(ValueError):
+            client.analyse("(1)")
+        stats = client.stats()
+        assert stats["requests"] == 3 and stats["cache"]["hits"] == 1
+    finally:
+        client.close()
+
+
+def test_a_batch_answers_repeats_once(running):
+    srv, port = running
+    lines = [json.dumps({"id": i, "position": text}).encode()
+             for i, text in enumerate(["3322", "44", "3322", "(", "3322"])]
+    replies = {reply["id"]: reply for reply in raw(port, lines)}
+    assert sorted(replies) == [0, 1, 2, 3, 4]
+    assert replies[0]["move"] == replies[2]["move"] == replies[4]["move"]
+    assert "error" in replies[3]
+    assert srv.batched == 2
+
+
+def test_every_request_gets_an_answer(running):
+    srv, port = running
+
+    async def broken(text):
+        raise RuntimeError("boom")
+    srv.analyse = broken
+    bad, error, other = raw(port, [b"not json", b'{"id": 7, "position": "3"}', b"[1, 2]"])
+    assert bad == other == {"error": "expected a position"}
+    assert error == {"error": "RuntimeError: boom", "id": 7}
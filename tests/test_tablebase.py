@@ -0,0 +1,31 @@
+import random
+
+import tablebase
+from bitboard import SIZE, Position
+from search import Searcher
+
+
+def test_tablebase_holds_every_solved_position(tmp_path):
+    path = str(tmp_path / "endgame.c4tb")
+    count = tablebase.generate(8, 5, path=path, seed=0, verbose=False)
+    table = {}
+    for pos in tablebase.seeds(8, 5, random.Random(0)):
+        tablebase.solve(pos, table)
+    assert count == len(table)
+
+    tb = tablebase.Tablebase(path)
+    assert tb.first_move() == SIZE - 8
+    for pos in tablebase.seeds(8, 5, random.Random(0)):
+        score = tb.probe(pos)
+        assert score == tablebase.solve(pos, {})
+        mirrored = Position.from_columns(pos.columns()[::-1])
+        assert tb.probe(mirrored) == score
+        assert Searcher(tablebase=tb).search(pos.copy()).score == score
+    # too early in the game, and an endgame from another game
+    assert tb.probe(Position.from_moves("3333")) is None
+    assert tb.probe(next(tablebase.seeds(6, 1, random.Random(9)))) is None
+
+
+def test_a_missing_tablebase_is_empty(tmp_path):
+    tb = tablebase.Tablebase(str(tmp_path / "none.c4tb"))
+    assert tb.probe(next(tablebase.seeds(4, 1, random.Random(0)))) is None
@@ -0,0 +1,49 @@
+import math
+
+import pytest
+
+import tournament
+from bitboard import Position
+
+
+def test_elo_is_finite_and_symmetric():
+    assert tournament.elo(0.5) == 0
+    assert tournament.elo(0.75) == pytest.approx(-tournament.elo(0.25))
+    rating, low, high = tournament.elo_interval([1.0] * 10)
+    assert all(math.isfinite(x) for x in (rating, low, high))
+    assert 0 < low < high
+    rating, low, high = tournament.elo_interval([1.0, 0.5, 0.0, 0.5])
+    assert low < rating == 0 < high
+
+
+def test_openings_are_distinct_and_still_going():
+    found = tournament.openings(10, 3, seed=1)
+    assert len(found) == 10
+    keys = set()
+    for moves in found:
+        pos = Position.from_moves("".join(map(str, moves)))
+        assert len(moves) == 3 and not pos.has_won()
+        keys.add(pos.canonical()[0])
+    assert len(keys) == 10
+
+
+def test_play_game_scores_the_first_engine():
+    job = ("random", "minimax:500", [3], 0)
+    back, (score, stats) = tournament.play_game(job)
+    assert back == job
+    assert score in (0.0, 0.5, 1.0)
+    moves = sum(stat[0] for stat in stats.values())
+    assert 1 + moves <= 42 and stats["minimax:500"][2] > 0
+
+
+def test_tournament_totals_add_up():
+    report = tournament.tournament(["random", "minimax:500"], count=2, plies=2, workers=1, verbose=False)
+    a, b = report["engines"]["random"], report["engines"]["minimax:500"]
+    assert a["games"] == b["games"] == 4
+    assert (a["wins"], a["draws"], a["losses"]) == (b["losses"], b["draws"], b["wins"])
+    assert report["pairs"]["random vs minimax:500"]["score"] == a["score"]
+
+
+def test_unknown_engines_are_refused():
+    with pytest.raises(ValueError):
+        tournament.make_engine("alphazero")
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import random
+
+import pytest
+
+import cli
+import gamelog
+from checkpoint import Checkpoint
+
+
+def table(model):
+    """every Q value of `model`, the loaded file's and its own"""
+    q = dict(model.table.items()) if model.table is not None else {}
+    q.update(model.q)
+    return q
+
+
+def digest(q):
+    return hashlib.md5(repr(sorted(q.items())).encode()).hexdigest()
+
+
+def _dying_worker(conn, *args):
+    conn.recv()
+    os._exit(3)
+
+
+def test_parallel_training_only_depends_on_its_seed(tmp_path):
+    runs = [cli.train_parallel(12, workers=2, sync_every=3, seed=seed, out=str(tmp_path / f"{i}.q"))
+            for i, seed in enumerate((5, 5, 6))]
+    assert table(runs[0]) == table(runs[1])
+    assert table(runs[0]) != table(runs[2])
+
+
+def test_a_dead_worker_fails_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "_train_worker", _dying_worker)
+    with pytest.raises(EOFError):
+        cli.train_parallel(4, workers=2, out=str(tmp_path / "map.q"))
+
+
+def test_selfplay_trains_the_recorded_table():
+    # recorded before getBestFuture had a cache: the cache only saves work,
+    # it must not change what tabular training learns
+    random.seed(1)
+    model = cli.AI()
+    for i in range(30):
+        cli.selfplay(model)
+    assert len(model.q) == 886
+    assert digest(model.q) == "60742fce430a0140145e5c316197d7f0"
+
+
+def test_replaying_the_log_gives_the_same_table(tmp_path):
+    log = str(tmp_path / "games.log")
+    random.seed(2)
+    trained = cli.train(15, str(tmp_path / "map.q"), log=log)
+    replayed = cli.AI()
+    assert gamelog.replay(replayed, log) == 15
+    assert table(replayed) == table(trained)
+
+
+def test_resuming_gives_the_same_table(tmp_path):
+    random.seed(3)
+    whole = cli.train(20, str(tmp_path / "a.q"), checkpoint=str(tmp_path / "a.ckpt"), checkpoint_every=5)
+    random.seed(3)
+    cli.train(10, str(tmp_path / "b.q"), checkpoint=str(tmp_path / "b.ckpt"), checkpoint_every=5)
+    # checkpointing every 5 games, as meta.json says, without being told again
+    resumed = cli.train(20, str(tmp_path / "b.q"), resume=str(tmp_path / "b.ckpt"))
+    assert table(resumed) == table(whole)
+    resumed_at = Checkpoint(str(tmp_path / "b.ckpt"))
+    assert (resumed_at.games, resumed_at.every) == (20, 5)
+
+
+def test_resuming_a_missing_checkpoint_fails(tmp_path, capsys):
+    missing = str(tmp_path / "none.ckpt")
+    with pytest.raises(FileNotFoundError):
+        cli.train(5, str(tmp_path / "map.q"), resume=missing)
+    with pytest.raises(SystemExit) as exit:
+        cli.main(["train", "5", "--out", str(tmp_path / "map.q"), "--resume", missing])
+    assert exit.value.code == 2
+    assert "not a checkpoint directory" in capsys.readouterr().err
+    assert not os.path.exists(tmp_path / "map.q")
@@ -0,0 +1,274 @@
+"""
+Engine against engine matches.
+
+    python tournament.py ai:2 ai:4 minimax:20000 mcts:2000 random --openings 20
+
+Every pair of engines plays every opening twice, once with each colour.
+The openings are a few random moves (`--plies`) from the empty board, the
+same for every pair. Games are played over a process pool.
+
+Engines:
+    ai:DEPTH[:QFILE]   cli.AI looking DEPTH moves ahead, with the Q-table QFILE
+    minimax:NODES      search.Searcher with a budget of NODES, book and tablebase
+                       included, as connect4.minimax plays
+    mcts:PLAYOUTS      mcts.MCTS with PLAYOUTS playouts a move
+    random             any legal move
+
+The report has each engine's wins/draws/losses and its Elo against the field,
+every pair's Elo difference, both with 95% confidence intervals, and the
+average time and nodes each engine spends on a move.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import cli
+from bitboard import SIZE, Position
+from book import default_book
+from mcts import MCTS
+from qtable import QTableFile
+from search import Searcher
+from tablebase import default_tablebase
+
+
+class QEngine:
+    def __init__(self, depth=4, path=None):
+        self.depth = depth
+        self.model = cli.AI(table=QTableFile(path) if path else None)
+
+    def move(self, game):
+        before = self.model.nodes
+        col = self.model.best_action(game, self.depth)[0]
+        return col, self.model.nodes - before
+
+
+class MinimaxEngine:
+    def __init__(self, nodes=20000):
+        self.nodes = nodes
+
+    def move(self, game):
+        pos = game.position
+        hit = default_book().probe(pos)
+        if hit is not None:
+            return hit[0], 0
+        res = Searcher(max_nodes=self.nodes, tablebase=default_tablebase()).search(pos.copy())
+        return res.move, res.nodes
+
+
+class MCTSEngine:
+    def __init__(self, playouts=2000, seed=None):
+        self.mcts = MCTS(playouts=playouts, time_limit=None, seed=seed)
+
+    def move(self, game):
+        res = self.mcts.search(game.position)
+        return res.move, res.nodes
+
+
+class RandomEngine:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def move(self, game):
+        return self.rng.choice(game.position.legal_columns()), 0
+
+
+def make_engine(spec, seed=None):
+    """an engine from its command line name, see the module docstring"""
+    kind, *args = spec.split(":")
+    if kind == "ai":
+        return QEngine(int(args[0]) if args else 4, args[1] if len(args) > 1 else None)
+    if kind == "minimax":
+        return MinimaxEngine(int(args[0]) if args else 20000)
+    if kind == "mcts":
+        return MCTSEngine(int(args[0]) if args else 2000, seed)
+    if kind == "random":
+        return RandomEngine(seed)
+    raise ValueError(f"unknown engine {spec!r}")
+
+
+def openings(count, plies, seed=0):
+    """`count` different random move sequences of `plies` moves that don't end the game"""
+    rng = random.Random(seed)
+    found = []
+    seen = set()
+    tries = 0
+    while len(found) < count and tries < 100 * count:
+        tries += 1
+        pos = Position()
+        moves = []
+        while len(moves) < plies:
+            col = rng.choice(pos.legal_columns())
+            if pos.is_winning_move(col):
+                break
+            pos.play(col)
+            moves.append(col)
+        key = pos.canonical()[0]
+        if len(moves) == plies and key not in seen:
+            seen.add(key)
+            found.append(moves)
+    return found
+
+
+# engines made in this worker process, by spec, kept from game to game
+_engines = {}
+
+
+def play_game(job):
+    """
+    plays one game, job = (first spec, second spec, opening, seed).
+    Returns the job and (result for the first engine: 1, 0.5 or 0, {spec: [moves, seconds, nodes]})
+    """
+    first, second, opening, seed = job
+    specs = (first, second)
+    engines = []
+    for spec in specs:
+        if spec not in _engines:
+            _engines[spec] = make_engine(spec, seed)
+        engines.append(_engines[spec])
+    stats = {spec: [0, 0.0, 0] for spec in specs}
+
+    game = cli.Game()
+    for col in opening:
+        game.makeMove(col)
+    while game.winner is None:
+        side = game.position.moves % 2
+        start = time.perf_counter()
+        col, nodes = engines[side].move(game)
+        elapsed = time.perf_counter() - start
+        if col not in game.position.legal_columns():
+            raise RuntimeError(f"{specs[side]} played an illegal move {col}")
+        game.makeMove(col)
+        stat = stats[specs[side]]
+        stat[0] += 1
+        stat[1] += elapsed
+        stat[2] += nodes
+    if game.winner == -1:
+        score = 0.5
+    else:
+        # the side that made the last move won
+        score = 1.0 if (game.position.moves - 1) % 2 == 0 else 0.0
+    return job, (score, stats)
+
+
+def elo(score):
+    """Elo difference that scores `score` (0..1) on average"""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_interval(results, z=1.96):
+    """
+    (Elo, low, high) from a list of game scores, the interval at ~95% by default.
+    The interval is the Wilson score interval, which stays meaningful when one
+    side won every game
+    """
+    n = len(results)
+    mean = sum(results) / n
+    centre = (mean + z * z / (2 * n)) / (1 + z * z / n)
+    spread = z * math.sqrt(mean * (1 - mean) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return elo(mean), elo(centre - spread), elo(centre + spread)
+
+
+class Tally:
+    """the results and costs of one engine, or of one engine against another"""
+    def __init__(self):
+        self.scores = []
+        self.moves = 0
+        self.seconds = 0.0
+        self.nodes = 0
+
+    def add(self, score, moves=0, seconds=0.0, nodes=0):
+        self.scores.append(score)
+        self.moves += moves
+        self.seconds += seconds
+        self.nodes += nodes
+
+    def report(self):
+        scores = self.scores
+        n = len(scores)
+        rating, low, high = elo_interval(scores) if n else (0, 0, 0)
+        return {
+            "games": n,
+            "wins": scores.count(1.0),
+            "draws": scores.count(0.5),
+            "losses": scores.count(0.0),
+            "score": sum(scores) / n if n else 0,
+            "elo": rating,
+            "elo_low": low,
+            "elo_high": high,
+            "ms_per_move": 1000 * self.seconds / self.moves if self.moves else 0,
+            "nodes_per_move": self.nodes / self.moves if self.moves else 0,
+        }
+
+
+def tournament(specs, count=10, plies=2, workers=None, seed=0, verbose=True):
+    """
+    plays the round robin and returns its report:
+    {"engines": {spec: totals}, "pairs": {"a vs b": totals for a}}
+    """
+    jobs = []
+    for i, opening in enumerate(openings(count, plies, seed)):
+        for a, b in itertools.combinations(specs, 2):
+            jobs.append((a, b, opening, seed + i))
+            jobs.append((b, a, opening, seed + i))
+    totals = {spec: Tally() for spec in specs}
+    pairs = {}
+
+    with multiprocessing.Pool(workers) as pool:
+        for done, (job, (score, stats)) in enumerate(pool.imap_unordered(play_game, jobs), 1):
+            first, second = job[0], job[1]
+            totals[first].add(score, *stats[first])
+            totals[second].add(1 - score, *stats[second])
+            a, b = sorted((first, second), key=specs.index)
+            pairs.setdefault(f"{a} vs {b}", Tally()).add(score if a == first else 1 - score)
+            if verbose and done % 10 == 0:
+                print(f"{done}/{len(jobs)} games")
+
+    return {
+        "engines": {spec: tally.report() for spec, tally in totals.items()},
+        "pairs": {name: tally.report() for name, tally in pairs.items()},
+    }
+
+
+def show(report):
+    print(f"{'engine':22} {'games':>5} {'W':>4} {'D':>4} {'L':>4} {'elo':>18} {'ms/move':>9} {'nodes/move':>11}")
+    for spec, r in sorted(report["engines"].items(), key=lambda item: -item[1]["score"]):
+        interval = f"{r['elo']:+.0f} [{r['elo_low']:+.0f}, {r['elo_high']:+.0f}]"
+        print(f"{spec:22} {r['games']:5} {r['wins']:4} {r['draws']:4} {r['losses']:4} {interval:>18} "
+              f"{r['ms_per_move']:9.1f} {r['nodes_per_move']:11.0f}")
+    print()
+    for name, r in report["pairs"].items():
+        print(f"{name:40} +{r['wins']} ={r['draws']} -{r['losses']}  "
+              f"elo {r['elo']:+.0f} [{r['elo_low']:+.0f}, {r['elo_high']:+.0f}]")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plays Connect4 engines against each other")
+    parser.add_argument("engines", nargs="+", help="ai:DEPTH[:QFILE], minimax:NODES, mcts:PLAYOUTS or random")
+    parser.add_argument("--openings", type=int, default=10, help="openings each pair plays (twice)")
+    parser.add_argument("--plies", type=int, default=2, help="random moves in an opening")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the report to this json file")
+    args = parser.parse_args(argv)
+    if len(set(args.engines)) != len(args.engines) or len(args.engines) < 2:
+        parser.error("needs at least two different engines")
+    if args.plies >= SIZE:
+        parser.error("--plies is longer than a game")
+
+    report = tournament(args.engines, args.openings, args.plies, args.workers, args.seed)
+    show(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())